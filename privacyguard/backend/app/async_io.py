@@ -0,0 +1,115 @@
+"""
+Asyncio-native I/O layer for the API.
+
+Provides an async SQLAlchemy engine and session dependency (asyncpg
+driver), pooled with the settings of the process role like the sync
+engine (see `database.get_pool_options`), and an awaitable wrapper around the shared boto3 clients. boto3
+itself is blocking, so `AsyncClient` runs each call on a dedicated thread
+pool sized by `ASYNC_IO_THREADS`: awaiting S3 or Rekognition then no longer
+occupies a slot of Starlette's request threadpool, and the number of
+concurrent AWS calls can be tuned independently of it.
+
+Nothing here is created at import time, so the module can be imported
+even when the async routes are disabled and asyncpg is not installed.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from . import database
+from .aws import get_client
+from .pool_metrics import InstrumentedAsyncAdaptedQueuePool, PoolMetrics
+
+
+# Activity of the async engine's pool, reported by `/metrics/db-pool` once
+# the engine exists.
+pool_metrics = PoolMetrics()
+
+_engine: Optional[AsyncEngine] = None
+_sessionmaker: Optional[async_sessionmaker] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def build_async_db_url() -> str:
+    """Return `ASYNC_DATABASE_URL` or the sync URL switched to the asyncpg driver."""
+    url = os.getenv("ASYNC_DATABASE_URL")
+    if url:
+        return url
+    return make_url(database.SQLALCHEMY_DATABASE_URL).set(drivername="postgresql+asyncpg").render_as_string(
+        hide_password=False
+    )
+
+
+def _create_async_engine(url: str) -> AsyncEngine:
+    if make_url(url).get_backend_name() == "sqlite":
+        # Local runs and benchmarks: SQLite brings its own pooling.
+        engine = create_async_engine(url)
+    else:
+        # Same pool settings as the sync engine of this process role.
+        engine = create_async_engine(
+            url, poolclass=InstrumentedAsyncAdaptedQueuePool, **database.get_pool_options()
+        )
+        engine.sync_engine.pool.metrics = pool_metrics
+    pool_metrics.attach(engine.sync_engine.pool)
+    return engine
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    """Return the async session factory, creating the engine on first use."""
+    global _engine, _sessionmaker
+    with _lock:
+        if _sessionmaker is None:
+            _engine = _create_async_engine(build_async_db_url())
+            _sessionmaker = async_sessionmaker(_engine, autoflush=False, expire_on_commit=False)
+        return _sessionmaker
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency that provides an `AsyncSession`, closed after use."""
+    async with get_async_sessionmaker()() as session:
+        yield session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            workers = int(os.getenv("ASYNC_IO_THREADS", "64"))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="async-io")
+        return _executor
+
+
+class AsyncClient:
+    """
+    Awaitable facade over a boto3 client.
+
+    Every attribute that is a client method becomes a coroutine function with
+    the same signature, e.g. ``await AsyncClient("s3").head_object(...)``.
+    """
+
+    def __init__(self, service: str) -> None:
+        self._client = get_client(service)
+
+    def __getattr__(self, name: str):
+        method = getattr(self._client, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_get_executor(), functools.partial(method, *args, **kwargs))
+
+        return call
+
+    @property
+    def sync(self):
+        """The wrapped boto3 client, for calls that do no I/O (e.g. presigning)."""
+        return self._client
@@ -0,0 +1,197 @@
+"""
+Asyncio-native variants of the read-heavy API endpoints.
+
+These handlers serve the same paths and responses as their sync
+counterparts in `main`, but await Postgres through an `AsyncSession` and
+S3/Rekognition through `async_io.AsyncClient` instead of blocking a
+threadpool slot for the duration of each call. They are registered ahead of
+the sync routes when `API_ASYNC_ROUTES=true`; otherwise the sync handlers
+serve every request.
+"""
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import auth, celery_app, models, pagination, renditions, schemas, variants
+from .async_io import AsyncClient, get_async_db
+from .aws import get_collection_id
+
+
+router = APIRouter()
+
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(auth.oauth2_scheme)
+) -> models.User:
+    """Async counterpart of `auth.get_current_user`."""
+    username = auth.decode_username(token)
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    user = result.scalars().first()
+    if user is None:
+        raise auth.credentials_exception()
+    return user
+
+
+async def _get_photo_or_404(
+    db: AsyncSession, photo_id: int, with_faces: bool = False, with_variant: bool = False
+) -> models.Photo:
+    stmt = select(models.Photo).where(models.Photo.id == photo_id)
+    if with_faces:
+        stmt = stmt.options(selectinload(models.Photo.faces))
+    if with_variant:
+        stmt = stmt.options(selectinload(models.Photo.blurred_variant))
+    photo = (await db.execute(stmt)).scalars().first()
+    if not photo:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    return photo
+
+
+def _presigned_url(s3: AsyncClient, key: str) -> str:
+    # Presigning is a local computation: no need to leave the event loop.
+    return s3.sync.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": os.getenv("S3_BUCKET", "photos"), "Key": key},
+        ExpiresIn=3600,
+    )
+
+
+@router.get("/photos", response_model=List[schemas.PhotoResponse])
+async def list_photos(
+    response: Response,
+    # Aliased as in `main.list_photos`.
+    status_filter: Optional[models.PhotoStatus] = Query(None, alias="status"),
+    consent_filter: Optional[models.ConsentSummary] = Query(None, alias="consent"),
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """List photos, newest first, one page at a time (see `main.list_photos`)."""
+    stmt = pagination.photo_page_statement(
+        limit, cursor, status_filter, consent_filter, uploaded_after, uploaded_before
+    )
+    result = await db.execute(stmt.options(selectinload(models.Photo.faces)))
+    photos, next_cursor = pagination.split_page(result.scalars().all(), limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return photos
+
+
+@router.get("/photos/{photo_id}", response_model=schemas.PhotoResponse)
+async def get_photo(
+    photo_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Retrieve a single photo and its faces."""
+    return await _get_photo_or_404(db, photo_id, with_faces=True)
+
+
+@router.get("/photos/{photo_id}/url")
+async def get_photo_url(
+    photo_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Return a pre‑signed URL for the original image, valid for one hour."""
+    photo = await _get_photo_or_404(db, photo_id)
+    return {"url": _presigned_url(AsyncClient("s3"), photo.s3_key)}
+
+
+async def _rendition_url(db: AsyncSession, photo_id: int, name: str) -> dict:
+    photo = await _get_photo_or_404(db, photo_id)
+    if not photo.has_renditions:
+        raise HTTPException(status_code=404, detail="Rendition not available")
+    return {"url": _presigned_url(AsyncClient("s3"), renditions.rendition_key(photo.s3_key, name))}
+
+
+@router.get("/photos/{photo_id}/thumbnail_url")
+async def get_thumbnail_url(
+    photo_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Return a pre‑signed URL for the grid thumbnail of a photo, valid for one hour."""
+    return await _rendition_url(db, photo_id, renditions.THUMB)
+
+
+@router.get("/photos/{photo_id}/preview_url")
+async def get_preview_url(
+    photo_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Return a pre‑signed URL for the detail-page preview of a photo, valid for one hour."""
+    return await _rendition_url(db, photo_id, renditions.PREVIEW)
+
+
+@router.get("/photos/{photo_id}/blurred_url")
+async def get_blurred_url(
+    photo_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Return a pre‑signed URL for the current blurred version of a photo (see `main.get_blurred_url`)."""
+    photo = await _get_photo_or_404(db, photo_id, with_faces=True, with_variant=True)
+    variant = photo.blurred_variant
+    if variant is None or variant.s3_key is None:
+        raise HTTPException(status_code=404, detail="Blurred image not found")
+    if not variants.is_current(variant, photo.faces):
+        # Publishing to the broker blocks: keep it off the event loop.
+        await run_in_threadpool(
+            celery_app.celery_app.send_task, "worker.tasks.generate_blur", args=[photo_id]
+        )
+        raise HTTPException(status_code=409, detail="Blurred image is out of date; regeneration queued")
+    s3 = AsyncClient("s3")
+    try:
+        await s3.head_object(Bucket=os.getenv("S3_BUCKET", "photos"), Key=variant.s3_key)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Blurred image not found")
+    return {"url": _presigned_url(s3, variant.s3_key)}
+
+
+@router.post("/client/search")
+async def client_search(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
+    """
+    Upload a selfie and receive the photos where the same face appears.
+
+    Returns a JSON list of objects with photo_id and a download URL.
+    """
+    max_bytes = int(os.getenv("SEARCH_MAX_IMAGE_BYTES", str(5 * 1024 * 1024)))
+    image_bytes = await file.read(max_bytes + 1)
+    if len(image_bytes) > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Selfie larger than {max_bytes} bytes",
+        )
+    try:
+        response = await AsyncClient("rekognition").search_faces_by_image(
+            CollectionId=get_collection_id(),
+            Image={"Bytes": image_bytes},
+            MaxFaces=10,
+            FaceMatchThreshold=80,
+        )
+    except Exception:
+        # if collection does not exist or error, return empty list
+        return []
+    matched_ids = [m["Face"]["FaceId"] for m in response.get("FaceMatches", [])]
+    if not matched_ids:
+        return []
+    stmt = (
+        select(models.Photo.id, models.Photo.s3_key)
+        .join(models.Face, models.Face.photo_id == models.Photo.id)
+        .where(models.Face.rekognition_face_id.in_(matched_ids))
+        .distinct()
+        .order_by(models.Photo.id)
+    )
+    rows = (await db.execute(stmt)).all()
+    s3 = AsyncClient("s3")
+    return [{"photo_id": photo_id, "url": _presigned_url(s3, s3_key)} for photo_id, s3_key in rows]
@@ -70,27 +70,41 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def get_current_user(db: Session = Depends(database.get_db), token: str = Depends(oauth2_scheme)) -> models.User:
+def credentials_exception() -> HTTPException:
+    """Return the 401 error raised for missing, invalid or expired tokens."""
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def decode_username(token: str) -> str:
     """
-    Retrieve the currently authenticated user based on the JWT token.
+    Return the username stored in a JWT access token.
 
     Raises HTTPException if the token is invalid or expired.
     """
     secret_key = os.getenv("JWT_SECRET_KEY", "secret")
     algorithm = os.getenv("JWT_ALGORITHM", "HS256")
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
     try:
         payload = jwt.decode(token, secret_key, algorithms=[algorithm])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise credentials_exception()
+    return username
+
+
+def get_current_user(db: Session = Depends(database.get_db), token: str = Depends(oauth2_scheme)) -> models.User:
+    """
+    Retrieve the currently authenticated user based on the JWT token.
+
+    Raises HTTPException if the token is invalid or expired.
+    """
+    username = decode_username(token)
     user = db.query(models.User).filter(models.User.username == username).first()
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     return user
\ No newline at end of file
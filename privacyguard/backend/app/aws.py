@@ -0,0 +1,123 @@
+"""
+Process-wide registry of boto3 clients.
+
+Building a boto3 client loads service models, resolves endpoints and
+credentials and allocates a fresh HTTP connection pool, which costs
+milliseconds of CPU and throws away every kept-alive connection. Clients
+are thread-safe once built, so the API and the worker share one client per
+service and process through `get_client`.
+
+Connection pooling, keep-alive and retry behaviour are configured from
+environment variables:
+
+* `AWS_MAX_POOL_CONNECTIONS`: HTTP connections kept per client (default 50).
+* `AWS_TCP_KEEPALIVE`: enable TCP keep-alive on those connections (default true).
+* `AWS_MAX_ATTEMPTS` / `AWS_RETRY_MODE`: botocore retry policy (default 5, standard).
+* `AWS_CONNECT_TIMEOUT` / `AWS_READ_TIMEOUT`: socket timeouts in seconds.
+
+`FACE_SERVICE_BACKEND=fake` swaps Rekognition for the in-process
+`fake_rekognition` service, e.g. for benchmarks.
+
+The registry is emptied in the child after `fork()`, so Celery prefork
+children never reuse sockets inherited from their parent.
+"""
+import os
+import threading
+from typing import Dict
+
+import boto3
+from botocore.client import Config
+
+
+_clients: Dict[str, object] = {}
+_lock = threading.Lock()
+_session = None
+
+
+def client_config(service: str) -> Config:
+    """Return the botocore configuration used for `service` clients."""
+    options = dict(
+        max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50")),
+        tcp_keepalive=os.getenv("AWS_TCP_KEEPALIVE", "true").lower() == "true",
+        connect_timeout=float(os.getenv("AWS_CONNECT_TIMEOUT", "10")),
+        read_timeout=float(os.getenv("AWS_READ_TIMEOUT", "60")),
+        retries={
+            "max_attempts": int(os.getenv("AWS_MAX_ATTEMPTS", "5")),
+            "mode": os.getenv("AWS_RETRY_MODE", "standard"),
+        },
+    )
+    if service == "s3":
+        options["signature_version"] = "s3v4"
+    return Config(**options)
+
+
+def get_face_service_backend() -> str:
+    """Return `FACE_SERVICE_BACKEND`: `rekognition` (default) or `fake` (see `fake_rekognition`)."""
+    return os.getenv("FACE_SERVICE_BACKEND", "rekognition").lower()
+
+
+def _client_kwargs(service: str) -> dict:
+    kwargs = dict(
+        region_name=os.getenv("AWS_REGION", "us-east-1"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        config=client_config(service),
+    )
+    if service == "rekognition" and get_face_service_backend() == "fake":
+        # Requests are answered locally but still signed.
+        kwargs["aws_access_key_id"] = kwargs["aws_access_key_id"] or "fake"
+        kwargs["aws_secret_access_key"] = kwargs["aws_secret_access_key"] or "fake"
+    if service == "s3":
+        # MinIO (or any S3-compatible store) is only used for object storage.
+        kwargs["endpoint_url"] = os.getenv("AWS_ENDPOINT_URL")
+        kwargs["use_ssl"] = os.getenv("AWS_USE_SSL", "False").lower() == "true"
+    return kwargs
+
+
+def get_client(service: str):
+    """Return the shared boto3 client for `service`, building it on first use."""
+    client = _clients.get(service)
+    if client is not None:
+        return client
+    global _session
+    with _lock:
+        client = _clients.get(service)
+        if client is None:
+            # boto3's default session is not safe to build clients from
+            # concurrently; the lock also guarantees a single client.
+            if _session is None:
+                _session = boto3.session.Session()
+            client = _session.client(service, **_client_kwargs(service))
+            if service == "rekognition" and get_face_service_backend() == "fake":
+                from . import fake_rekognition
+
+                fake_rekognition.install(client)
+            _clients[service] = client
+        return client
+
+
+def reset_clients() -> None:
+    """Drop every cached client so that the next call builds new ones."""
+    global _session, _lock
+    # A fork may happen while another thread holds the lock; start afresh.
+    _lock = threading.Lock()
+    _clients.clear()
+    _session = None
+
+
+os.register_at_fork(after_in_child=reset_clients)
+
+
+def get_s3_client():
+    """Return the shared S3 client configured for MinIO or AWS."""
+    return get_client("s3")
+
+
+def get_rekognition_client():
+    """Return the shared Rekognition client."""
+    return get_client("rekognition")
+
+
+def get_collection_id() -> str:
+    """Return the Rekognition collection ID used for indexing faces."""
+    return os.getenv("AWS_REKOGNITION_COLLECTION", "privacyguard-collection")
@@ -0,0 +1,102 @@
+"""
+Per-photo consent counters.
+
+Each photo stores how many of its faces are approved, pending and
+rejected, plus the resulting `ConsentSummary`, so that listings and
+exports can filter on consent with an index scan instead of aggregating
+the faces table. The counters are written in the same transaction as the
+faces they describe: set wholesale when detection replaces a photo's
+faces, and adjusted by a single atomic UPDATE when one consent changes.
+`recount` rebuilds them from the faces table, e.g. after an upgrade added
+the columns to a database that already held photos.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import case, literal, update
+from sqlalchemy.orm import Session, selectinload
+
+from . import models
+
+
+_COUNT_COLUMNS = {
+    models.ConsentStatus.APPROVED: "approved_count",
+    models.ConsentStatus.PENDING: "pending_count",
+    models.ConsentStatus.REJECTED: "rejected_count",
+}
+
+
+def summarize(approved: int, pending: int, rejected: int) -> models.ConsentSummary:
+    """Return the consent summary of a photo with the given face counts."""
+    if rejected:
+        return models.ConsentSummary.REJECTED
+    if pending:
+        return models.ConsentSummary.PENDING
+    if approved:
+        return models.ConsentSummary.APPROVED
+    return models.ConsentSummary.NO_FACES
+
+
+def set_counts(photo: models.Photo, statuses: Iterable[models.ConsentStatus]) -> None:
+    """Reset the counters of `photo` to describe faces with the given statuses."""
+    statuses = list(statuses)
+    counts = {status: statuses.count(status) for status in _COUNT_COLUMNS}
+    photo.face_count = len(statuses)
+    for status, column in _COUNT_COLUMNS.items():
+        setattr(photo, column, counts[status])
+    photo.consent_summary = summarize(
+        counts[models.ConsentStatus.APPROVED],
+        counts[models.ConsentStatus.PENDING],
+        counts[models.ConsentStatus.REJECTED],
+    )
+
+
+def record_change(
+    db: Session, photo_id: int, old: Optional[models.ConsentStatus], new: models.ConsentStatus
+) -> None:
+    """
+    Move one face of a photo from consent `old` to `new`. The caller commits.
+
+    The counters are updated relative to their stored values in one UPDATE,
+    so concurrent changes to different faces of the same photo serialize on
+    the photo's row lock instead of overwriting each other. `old` must be
+    read from a face row locked by the caller (`with_for_update`):
+    otherwise two changes of the same face both apply a delta from the
+    same old status.
+    """
+    if old == new:
+        return
+    table = models.Photo.__table__
+    values = {}
+    for status, column in _COUNT_COLUMNS.items():
+        delta = (status == new) - (status == old)
+        values[column] = table.c[column] + delta
+    summary_type = table.c.consent_summary.type
+    values["consent_summary"] = case(
+        (values["rejected_count"] > 0, literal(models.ConsentSummary.REJECTED, summary_type)),
+        (values["pending_count"] > 0, literal(models.ConsentSummary.PENDING, summary_type)),
+        (values["approved_count"] > 0, literal(models.ConsentSummary.APPROVED, summary_type)),
+        else_=literal(models.ConsentSummary.NO_FACES, summary_type),
+    )
+    db.execute(update(table).where(table.c.id == photo_id).values(values))
+
+
+def recount(db: Session, batch_size: int = 500) -> int:
+    """Recompute the counters of every photo from its faces, committing per batch; return the photos seen."""
+    last_id = 0
+    total = 0
+    while True:
+        photos = (
+            db.query(models.Photo)
+            .options(selectinload(models.Photo.faces))
+            .filter(models.Photo.id > last_id)
+            .order_by(models.Photo.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not photos:
+            return total
+        for photo in photos:
+            set_counts(photo, [face.consent_status for face in photo.faces])
+        db.commit()
+        last_id = photos[-1].id
+        total += len(photos)
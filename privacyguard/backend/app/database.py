@@ -9,24 +9,99 @@ dependencies, yielding a database session and ensuring it is closed after
 use.
 """
 import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine, Result, make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import Executable
+
+from .pool_metrics import InstrumentedQueuePool, PoolMetrics
 
 
 def _build_db_url() -> str:
-    """Assemble the SQLAlchemy database URL from environment variables."""
-    user = os.getenv("POSTGRES_USER", "postgres")
-    password = os.getenv("POSTGRES_PASSWORD", "postgres")
-    host = os.getenv("POSTGRES_HOST", "db")
-    port = os.getenv("POSTGRES_PORT", "5432")
-    db_name = os.getenv("POSTGRES_DB", "privacyguard")
-    return f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
+    """
+    Return `DATABASE_URL`, or assemble the URL from the `POSTGRES_*` variables.
+
+    PostgreSQL URLs without an explicit driver are pinned to psycopg2, the
+    driver installed with the application.
+    """
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        user = os.getenv("POSTGRES_USER", "postgres")
+        password = os.getenv("POSTGRES_PASSWORD", "postgres")
+        host = os.getenv("POSTGRES_HOST", "db")
+        port = os.getenv("POSTGRES_PORT", "5432")
+        db_name = os.getenv("POSTGRES_DB", "privacyguard")
+        url = f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
+    parsed = make_url(url)
+    if parsed.drivername in ("postgres", "postgresql"):
+        url = parsed.set(drivername="postgresql+psycopg2").render_as_string(hide_password=False)
+    return url
+
+
+def get_process_role() -> str:
+    """Return `DB_PROCESS_ROLE`: `api` (default) or `worker`."""
+    return os.getenv("DB_PROCESS_ROLE", "api").lower()
+
+
+# Pool defaults per process role. The API serves many requests at once from
+# Starlette's threadpool (40 threads by default); a Celery worker process
+# runs `CELERY_WORKER_CONCURRENCY` (4) tasks on threads, each holding one
+# connection, plus a couple spare.
+POOL_DEFAULTS = {
+    "api": {"pool_size": 20, "max_overflow": 20, "pool_timeout": 30, "pool_recycle": 1800, "pool_pre_ping": True},
+    "worker": {"pool_size": 4, "max_overflow": 2, "pool_timeout": 30, "pool_recycle": 1800, "pool_pre_ping": True},
+}
+
+
+def _pool_setting(role: str, name: str):
+    default = POOL_DEFAULTS.get(role, POOL_DEFAULTS["api"])[name]
+    key = name.upper().replace("POOL_", "")
+    # Role-specific value (e.g. DB_WORKER_POOL_SIZE) over the generic one
+    # (DB_POOL_SIZE) over the built-in default.
+    value = os.getenv(f"DB_{role.upper()}_POOL_{key}", os.getenv(f"DB_POOL_{key}"))
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.lower() == "true"
+    return type(default)(value)
+
+
+def get_pool_options(role: Optional[str] = None) -> dict:
+    """
+    Return the `create_engine` pool arguments for a process role.
+
+    Each setting can be overridden with `DB_<ROLE>_POOL_<SETTING>` or, for
+    every role, `DB_POOL_<SETTING>`, where SETTING is SIZE, MAX_OVERFLOW,
+    TIMEOUT, RECYCLE or PRE_PING. Pre-ping tests each connection on checkout
+    at the cost of a round trip; with it disabled, connections are only
+    replaced after `RECYCLE` seconds or once a query fails on them, which
+    invalidates the whole pool.
+    """
+    role = role or get_process_role()
+    return {name: _pool_setting(role, name) for name in POOL_DEFAULTS["api"]}
+
+
+def _create_engine(url: str) -> Engine:
+    if make_url(url).get_backend_name() == "sqlite":
+        # Local runs and benchmarks: SQLite brings its own pooling.
+        engine = create_engine(url)
+        pool_metrics.attach(engine.pool)
+        return engine
+    engine = create_engine(url, poolclass=InstrumentedQueuePool, **get_pool_options())
+    engine.pool.metrics = pool_metrics
+    pool_metrics.attach(engine.pool)
+    return engine
+
 
+# Connection churn, checkout waits and occupancy of `engine`'s pool, served
+# by the `/metrics/db-pool` endpoint.
+pool_metrics = PoolMetrics()
 
-# Create the SQLAlchemy engine.  `pool_pre_ping=True` helps to avoid
-# stale connections when the database restarts.
 SQLALCHEMY_DATABASE_URL = _build_db_url()
-engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
+engine = _create_engine(SQLALCHEMY_DATABASE_URL)
 
 # SessionLocal is a factory for database sessions.  Setting
 # `autocommit=False` and `autoflush=False` gives us explicit control over
@@ -45,4 +120,47 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Provide a session for a unit of work outside of a request, e.g. a task.
+
+    The caller commits; whatever is left uncommitted is rolled back when
+    the block exits, and the session is always closed so its connection
+    returns to the pool even when the block raises.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def get_stream_batch_size() -> int:
+    """Return `DB_STREAM_BATCH_SIZE`, the rows fetched per round trip by `stream`."""
+    return max(1, int(os.getenv("DB_STREAM_BATCH_SIZE", "1000")))
+
+
+def stream(db: Session, stmt: Executable, batch_size: Optional[int] = None) -> Result:
+    """
+    Execute `stmt` and return a result that is read in batches.
+
+    The statement runs on a server-side cursor (a named cursor with
+    psycopg2) and rows are fetched `batch_size` at a time (default
+    `DB_STREAM_BATCH_SIZE`); ORM entities are built per batch as well, so
+    memory stays flat however many rows match. The result must be consumed
+    before the session is used for anything else.
+    """
+    batch_size = batch_size or get_stream_batch_size()
+    return db.execute(stmt.execution_options(yield_per=batch_size, stream_results=True))
+
+
+def stream_scalars(db: Session, stmt: Executable, batch_size: Optional[int] = None) -> Iterator:
+    """Like `stream`, yielding the first column of each row (e.g. ORM entities)."""
+    return iter(stream(db, stmt, batch_size).scalars())
@@ -0,0 +1,104 @@
+"""
+Export planning queries.
+
+Deciding which photos go into an export is done by the database: photos
+are selected on their stored consent summary (see `consent`), which the
+partial indexes on `photos` serve directly, and the result is read
+through a server-side cursor as plain rows, so planning an export never
+hydrates `Photo`/`Face` objects and its memory use does not grow with the
+size of the archive.
+
+The summary is denormalized, so the approved export also checks the faces
+table: a summary out of step with the faces must never let a photo with a
+face lacking approved consent through unblurred.
+"""
+from itertools import groupby
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, exists, select
+from sqlalchemy.orm import Session
+
+from . import database, models, variants
+
+# Photos that can be shared as they are.
+_SHAREABLE = (models.ConsentSummary.NO_FACES, models.ConsentSummary.APPROVED)
+
+
+class ExportRow(NamedTuple):
+    """A photo selected for export, with the faces it must hide."""
+
+    photo_id: int
+    s3_key: str
+    filename: str
+    # `(face_id, bbox)` of the faces without approved consent.
+    boxes: List[Tuple[int, dict]]
+    variant: Optional["VariantState"] = None
+
+
+class VariantState(NamedTuple):
+    """The stored blurred variant of a photo, as read from the database."""
+
+    s3_key: Optional[str]
+    consent_fingerprint: Optional[str]
+    is_stale: bool
+    mode: Optional[str] = None
+
+
+def _not_approved():
+    return models.Face.consent_status != models.ConsentStatus.APPROVED
+
+
+def iter_approved(db: Session) -> Iterator[ExportRow]:
+    """Yield, by id, the photos without faces or whose faces are all approved."""
+    stmt = (
+        select(models.Photo.id, models.Photo.s3_key, models.Photo.filename)
+        .where(
+            models.Photo.consent_summary.in_(_SHAREABLE),
+            ~exists().where(models.Face.photo_id == models.Photo.id, _not_approved()),
+        )
+        .order_by(models.Photo.id)
+    )
+    for photo_id, s3_key, filename in database.stream(db, stmt):
+        yield ExportRow(photo_id, s3_key, filename, [])
+
+
+def iter_to_blur(db: Session) -> Iterator[ExportRow]:
+    """
+    Yield, by id, the photos with at least one face lacking approved consent.
+
+    Each row carries the boxes of those faces and the state of the photo's
+    blurred variant, which is all that is needed to tell whether the
+    variant is current (see `variants.boxes_fingerprint`).
+    """
+    stmt = (
+        select(
+            models.Photo.id,
+            models.Photo.s3_key,
+            models.Photo.filename,
+            models.BlurredVariant.s3_key,
+            models.BlurredVariant.consent_fingerprint,
+            models.BlurredVariant.is_stale,
+            models.BlurredVariant.mode,
+            models.Face.id,
+            models.Face.bbox,
+        )
+        .join(models.Face, and_(models.Face.photo_id == models.Photo.id, _not_approved()))
+        .outerjoin(models.BlurredVariant, models.BlurredVariant.photo_id == models.Photo.id)
+        .where(models.Photo.consent_summary.notin_(_SHAREABLE))
+        .order_by(models.Photo.id, models.Face.id)
+    )
+    # One row per non-approved face: regroup them by photo.
+    for _, rows in groupby(database.stream(db, stmt), key=lambda row: row[0]):
+        rows = list(rows)
+        photo_id, s3_key, filename, variant_key, fingerprint, is_stale, mode = rows[0][:7]
+        variant = VariantState(variant_key, fingerprint, bool(is_stale), mode) if variant_key is not None else None
+        yield ExportRow(photo_id, s3_key, filename, [(row[7], row[8]) for row in rows], variant)
+
+
+def has_current_variant(row: ExportRow, mode: Optional[str] = None) -> bool:
+    """Row-based counterpart of `variants.is_current`."""
+    return (
+        row.variant is not None
+        and not row.variant.is_stale
+        and row.variant.consent_fingerprint == variants.boxes_fingerprint(row.boxes, mode or row.variant.mode)
+    )
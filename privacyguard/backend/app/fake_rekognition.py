@@ -0,0 +1,204 @@
+"""
+Offline stand-in for Amazon Rekognition.
+
+With `FACE_SERVICE_BACKEND=fake` the shared Rekognition client (see
+`aws.get_client`) is a regular boto3 client whose HTTP requests are
+answered in process instead of being sent to AWS. Request signing,
+response parsing, modeled exceptions and botocore's retry policy all
+behave as with the real service, so the pipeline can be load-tested and
+its retry behaviour measured without network access or AWS costs.
+
+Results are synthetic but deterministic, derived from the image bytes:
+
+* `DetectFaces` returns 0 to `FAKE_REKOGNITION_MAX_FACES` (default 4)
+  non-overlapping boxes.
+* `IndexFaces` assigns the image one of `FAKE_REKOGNITION_IDENTITIES`
+  (default 50) synthetic identities and records a face for it.
+* `SearchFacesByImage` returns the indexed faces sharing the identity of
+  the query image.
+* `CreateCollection` fails with `ResourceAlreadyExistsException` for a
+  collection that already exists in this process.
+
+Service behaviour is injected from the environment:
+
+* `FAKE_REKOGNITION_LATENCY`: latency of every call, as `fixed:<ms>`,
+  `uniform:<min_ms>,<max_ms>` or `lognormal:<median_ms>,<sigma>` (default
+  `fixed:0`). `FAKE_REKOGNITION_LATENCY_<OPERATION>` (e.g.
+  `..._DETECTFACES`) overrides it for one operation.
+* `FAKE_REKOGNITION_THROTTLE_RATE`: probability in [0, 1] that a call
+  fails with `ThrottlingException` (default 0).
+* `FAKE_REKOGNITION_SEED`: seed of the latency and throttling draws.
+"""
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from botocore.awsrequest import AWSResponse
+
+
+class _Body:
+    """Minimal urllib3-like body accepted by `AWSResponse`."""
+
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+
+    def stream(self, **kwargs):
+        yield self._data
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Return a sampler of latencies in seconds for a `FAKE_REKOGNITION_LATENCY` spec."""
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value.strip()]
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+def _digest(image: dict) -> bytes:
+    return hashlib.sha256(base64.b64decode(image.get("Bytes", ""))).digest()
+
+
+class FakeRekognition:
+    """In-process Rekognition service answering botocore requests."""
+
+    def __init__(self) -> None:
+        self.max_faces = max(0, int(os.getenv("FAKE_REKOGNITION_MAX_FACES", "4")))
+        self.identities = max(1, int(os.getenv("FAKE_REKOGNITION_IDENTITIES", "50")))
+        self.throttle_rate = float(os.getenv("FAKE_REKOGNITION_THROTTLE_RATE", "0"))
+        self.default_latency = parse_latency(os.getenv("FAKE_REKOGNITION_LATENCY", "fixed:0"))
+        self._latencies: Dict[str, Callable[[random.Random], float]] = {}
+        seed = os.getenv("FAKE_REKOGNITION_SEED")
+        self._rng = random.Random(int(seed) if seed is not None else None)
+        self._lock = threading.Lock()
+        # collection -> identity -> face ids
+        self.collections: Dict[str, Dict[int, List[str]]] = {}
+
+    def _latency(self, operation: str) -> Callable[[random.Random], float]:
+        if operation not in self._latencies:
+            spec = os.getenv(f"FAKE_REKOGNITION_LATENCY_{operation.upper()}")
+            self._latencies[operation] = parse_latency(spec) if spec else self.default_latency
+        return self._latencies[operation]
+
+    def handle(self, request, **kwargs) -> AWSResponse:
+        """`before-send` handler: answer `request` without touching the network."""
+        operation = request.headers["X-Amz-Target"].decode().split(".", 1)[1]
+        with self._lock:
+            delay = self._latency(operation)(self._rng)
+            throttled = self._rng.random() < self.throttle_rate
+        time.sleep(delay)
+        if throttled:
+            return self._error(400, "ThrottlingException", "Rate exceeded")
+        params = json.loads(request.body or b"{}")
+        try:
+            result = getattr(self, operation)(params)
+        except _ServiceError as exc:
+            return self._error(400, exc.code, exc.message)
+        return self._response(200, result)
+
+    def _response(self, status: int, payload: dict) -> AWSResponse:
+        body = json.dumps(payload).encode("utf-8")
+        headers = {
+            "Content-Type": "application/x-amz-json-1.1",
+            "Content-Length": str(len(body)),
+            "x-amzn-RequestId": str(uuid.uuid4()),
+        }
+        return AWSResponse("https://rekognition.fake", status, headers, _Body(body))
+
+    def _error(self, status: int, code: str, message: str) -> AWSResponse:
+        return self._response(status, {"__type": code, "message": message})
+
+    def _identity(self, image: dict) -> int:
+        return int.from_bytes(_digest(image)[:4], "big") % self.identities
+
+    def _collection(self, params: dict) -> Dict[int, List[str]]:
+        collection = self.collections.get(params["CollectionId"])
+        if collection is None:
+            raise _ServiceError("ResourceNotFoundException", "The collection id does not exist")
+        return collection
+
+    # Operations, named after the `X-Amz-Target` action.
+
+    def CreateCollection(self, params: dict) -> dict:
+        with self._lock:
+            if params["CollectionId"] in self.collections:
+                raise _ServiceError("ResourceAlreadyExistsException", "The collection already exists")
+            self.collections[params["CollectionId"]] = {}
+        return {"StatusCode": 200, "CollectionArn": f"aws:rekognition:fake:collection/{params['CollectionId']}"}
+
+    def DetectFaces(self, params: dict) -> dict:
+        digest = _digest(params["Image"])
+        count = int.from_bytes(digest[:4], "big") % (self.max_faces + 1)
+        width = 1.0 / max(count, 1)
+        faces = []
+        for i in range(count):
+            # Each face draws its attributes from a hash of its own, so any
+            # number of faces can be derived from one image.
+            face = hashlib.sha256(digest + i.to_bytes(4, "big")).digest()
+            # One face per vertical band, so boxes never overlap.
+            size = width * (0.3 + 0.5 * face[0] / 255)
+            faces.append(
+                {
+                    "BoundingBox": {
+                        "Left": i * width + (width - size) / 2,
+                        "Top": 0.5 * face[1] / 255,
+                        "Width": size,
+                        "Height": min(size, 0.5),
+                    },
+                    "Confidence": 99.0 + face[2] / 255,
+                }
+            )
+        return {"FaceDetails": faces}
+
+    def IndexFaces(self, params: dict) -> dict:
+        identity = self._identity(params["Image"])
+        face_id = str(uuid.UUID(bytes=_digest(params["Image"])[:16]))
+        with self._lock:
+            faces = self._collection(params).setdefault(identity, [])
+            if face_id not in faces:
+                faces.append(face_id)
+        record = {
+            "Face": {
+                "FaceId": face_id,
+                "BoundingBox": {"Left": 0.0, "Top": 0.0, "Width": 1.0, "Height": 1.0},
+                "ExternalImageId": params.get("ExternalImageId"),
+                "Confidence": 99.9,
+            }
+        }
+        return {"FaceRecords": [record], "UnindexedFaces": []}
+
+    def SearchFacesByImage(self, params: dict) -> dict:
+        identity = self._identity(params["Image"])
+        with self._lock:
+            face_ids = list(self._collection(params).get(identity, []))
+        matches = [
+            {"Similarity": 99.0, "Face": {"FaceId": face_id, "Confidence": 99.9}}
+            for face_id in face_ids[: params.get("MaxFaces", 80)]
+        ]
+        return {"FaceMatches": matches, "SearchedFaceConfidence": 99.9}
+
+
+class _ServiceError(Exception):
+    def __init__(self, code: str, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def install(client, service: FakeRekognition = None) -> FakeRekognition:
+    """Route every request of the Rekognition `client` to a fake service."""
+    service = service or FakeRekognition()
+    client.meta.events.register("before-send.rekognition", service.handle)
+    return service
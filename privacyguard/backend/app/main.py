@@ -7,23 +7,22 @@ images. It relies on a PostgreSQL database, MinIO/S3 for storage,
 Amazon Rekognition for face detection/recognition, RabbitMQ as a
 message broker and Celery for asynchronous processing.
 """
-import io
 import os
 import uuid
-import zipfile
-from datetime import timedelta
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
 
-import boto3
-from botocore.client import Config
-from fastapi import Depends, FastAPI, File, HTTPException, UploadFile, status
+from fastapi import Depends, FastAPI, File, HTTPException, Query, Response, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 
-from . import auth, database, models, schemas, celery_app
-from PIL import Image  # for image manipulation in export_privacy_safe
-from worker.tasks import blur_faces_in_image  # reuse helper from worker tasks
+from . import async_io, auth, consent, database, exports, migrations, models, pagination, renditions, schemas, celery_app, variants
+from .aws import get_collection_id, get_rekognition_client, get_s3_client
+from .storage import Upload, delete_keys, ensure_bucket, prefetch, upload_files
+from .zipstream import stream_zip
 
 
 app = FastAPI(title="PrivacyGuard API")
@@ -35,12 +34,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Blur-Pending", "X-Next-Cursor"],
 )
 
+# Asyncio-native handlers for the read-heavy endpoints. Routes match in
+# registration order, so including them here shadows the sync versions below.
+if os.getenv("API_ASYNC_ROUTES", "false").lower() == "true":
+    from .async_routes import router as async_router
+
+    app.include_router(async_router)
+
 
 def init_db() -> None:
-    """Create database tables if they don't exist."""
-    models.Base.metadata.create_all(bind=database.engine)
+    """Create database tables if they don't exist and add missing columns to existing ones."""
+    added = migrations.upgrade(database.engine)
+    if ("photos", "consent_summary") in added:
+        # Photos stored before the consent counters existed start at zero.
+        with database.session_scope() as db:
+            consent.recount(db)
 
 
 # Initialize tables at startup
@@ -48,48 +59,20 @@ def init_db() -> None:
 def on_startup():
     init_db()
     # Create default admin user if not exists
-    db = next(database.get_db())
-    if not db.query(models.User).filter(models.User.username == "admin").first():
-        hashed = auth.get_password_hash(os.getenv("DEFAULT_ADMIN_PASSWORD", "admin"))
-        user = models.User(username="admin", password_hash=hashed, role="admin")
-        db.add(user)
-        db.commit()
-
-
-# Helper functions for S3/MinIO
-def get_s3_client():
-    """Return a boto3 S3 client configured for MinIO or AWS."""
-    aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-    aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-    region = os.getenv("AWS_REGION", "us-east-1")
-    endpoint_url = os.getenv("AWS_ENDPOINT_URL")  # for MinIO
-    use_ssl = os.getenv("AWS_USE_SSL", "False").lower() == "true"
-    return boto3.client(
-        "s3",
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key,
-        region_name=region,
-        endpoint_url=endpoint_url,
-        use_ssl=use_ssl,
-        config=Config(signature_version="s3v4"),
-    )
-
-
-def upload_to_s3(bucket: str, key: str, data: bytes, content_type: str = "image/jpeg") -> None:
-    client = get_s3_client()
-    # Ensure bucket exists (creates if not present). MinIO and AWS return error if exists.
-    try:
-        client.create_bucket(Bucket=bucket)
-    except client.exceptions.BucketAlreadyOwnedByYou:
-        pass
-    except client.exceptions.BucketAlreadyExists:
-        pass
-    except Exception:
-        # ignore other errors; bucket may already exist or creation may not be permitted
-        pass
-    client.put_object(Bucket=bucket, Key=key, Body=data, ContentType=content_type)
-
-
+    with database.session_scope() as db:
+        if not db.query(models.User).filter(models.User.username == "admin").first():
+            hashed = auth.get_password_hash(os.getenv("DEFAULT_ADMIN_PASSWORD", "admin"))
+            user = models.User(username="admin", password_hash=hashed, role="admin")
+            db.add(user)
+            db.commit()
+    # Provision the bucket once up front; if storage is not reachable yet the
+    # first upload retries lazily.
+    ensure_bucket(get_s3_client(), os.getenv("S3_BUCKET", "photos"))
+
+
+# Helper functions for S3/MinIO. Clients come from the shared registry in
+# `aws`, which keeps one pooled client per service and process; uploads go
+# through `storage.upload_files`.
 def generate_presigned_url(bucket: str, key: str, expires_in: int = 3600) -> str:
     client = get_s3_client()
     return client.generate_presigned_url(
@@ -99,19 +82,58 @@ def generate_presigned_url(bucket: str, key: str, expires_in: int = 3600) -> str
     )
 
 
-def get_rekognition_client():
-    """Return a boto3 Rekognition client configured from environment variables."""
-    return boto3.client(
-        "rekognition",
-        region_name=os.getenv("AWS_REGION", "us-east-1"),
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    )
+def iter_object_chunks(obj: dict, chunk_size: Optional[int] = None):
+    """Yield the body of a `get_object` response in bounded chunks."""
+    chunk_size = chunk_size or int(os.getenv("EXPORT_CHUNK_SIZE", str(1024 * 1024)))
+    body = obj["Body"]
+    try:
+        yield from body.iter_chunks(chunk_size=chunk_size)
+    finally:
+        body.close()
+
+
+def _insert_uploaded_photos(
+    db: Session,
+    files: List[UploadFile],
+    uploads: List[Upload],
+    digests: List[str],
+    chunk_size: int,
+) -> Tuple[List[int], List[int], List[str]]:
+    """
+    Create the Photo rows for a batch of uploaded files and commit them.
 
+    Files whose digest matches an existing photo (or an earlier file of the
+    same batch) reuse that photo instead of creating a new row.
 
-def get_collection_id() -> str:
-    """Return the Rekognition collection ID used for indexing faces."""
-    return os.getenv("AWS_REKOGNITION_COLLECTION", "privacyguard-collection")
+    Returns:
+        The photo id for every file in order, the ids of newly created
+        photos and the S3 keys of uploaded objects made redundant by
+        deduplication.
+    """
+    existing = dict(
+        db.query(models.Photo.content_sha256, models.Photo.id)
+        .filter(models.Photo.content_sha256.in_(set(digests)))
+        .all()
+    )
+    by_digest = {}
+    new_photos: List[models.Photo] = []
+    duplicate_keys: List[str] = []
+    for file, (key, _, _), digest in zip(files, uploads, digests):
+        if digest in existing or digest in by_digest:
+            duplicate_keys.append(key)
+            continue
+        photo = models.Photo(
+            filename=file.filename, s3_key=key, content_sha256=digest, status=models.PhotoStatus.IN_QUEUE
+        )
+        by_digest[digest] = photo
+        new_photos.append(photo)
+    for start in range(0, len(new_photos), chunk_size):
+        db.add_all(new_photos[start : start + chunk_size])
+        # Flushing assigns primary keys through RETURNING, no refresh needed.
+        db.flush()
+    existing.update({digest: photo.id for digest, photo in by_digest.items()})
+    db.commit()
+    return [existing[digest] for digest in digests], [photo.id for photo in new_photos], duplicate_keys
 
 
 # API endpoints
@@ -139,45 +161,109 @@ def upload_photos(
     Upload one or more image files.
 
     Each file is stored in the S3/MinIO bucket and an entry is created in the
-    `photos` table with status `in_queue`. A Celery task is enqueued for
-    each photo to perform face detection. Only authenticated users may
-    upload.
+    `photos` table with status `in_queue`. Files are uploaded concurrently; if
+    any of them fails, nothing is stored and a 502 response lists the failed
+    files with their errors. All rows are inserted in a single transaction
+    (flushed in chunks of `UPLOAD_INSERT_CHUNK_SIZE`, each one a multi-row
+    INSERT ... RETURNING), and detection tasks covering up to
+    `PROCESS_BATCH_SIZE` photos each are enqueued only after the commit.
+    The returned ids follow the order of `files`. Only authenticated users
+    may upload.
+
+    Ingest is content addressed: a file whose SHA-256 matches an existing
+    photo returns that photo's id, its freshly uploaded copy is deleted and
+    no detection task is queued for it.
     """
     bucket = os.getenv("S3_BUCKET", "photos")
-    uploaded_ids: List[int] = []
+    chunk_size = max(1, int(os.getenv("UPLOAD_INSERT_CHUNK_SIZE", "500")))
+    s3 = get_s3_client()
+    uploads = []
     for file in files:
-        contents = file.file.read()
         ext = os.path.splitext(file.filename)[1].lower()
         key = f"{uuid.uuid4().hex}{ext}"
-        upload_to_s3(bucket, key, contents, content_type=file.content_type or "image/jpeg")
-        photo = models.Photo(filename=file.filename, s3_key=key, status=models.PhotoStatus.IN_QUEUE)
-        db.add(photo)
-        db.commit()
-        db.refresh(photo)
-        uploaded_ids.append(photo.id)
-        # Enqueue Celery task for detection
-        celery_app.celery_app.send_task("worker.tasks.process_photo", args=[photo.id])
-    return uploaded_ids
+        uploads.append((key, file.file, file.content_type or "image/jpeg"))
+    # Files are streamed from their spooled temporary files to S3 concurrently
+    # (UPLOAD_CONCURRENCY at a time) in bounded parts, so the request takes
+    # about as long as the slowest file and memory does not grow with size.
+    results = upload_files(s3, bucket, uploads)
+    failed = [
+        {"filename": file.filename, "error": str(result.error)}
+        for file, result in zip(files, results)
+        if result.error is not None
+    ]
+    if failed:
+        # All or nothing: drop the objects that did make it and report every
+        # file that failed so the client can retry.
+        delete_keys(s3, bucket, [key for (key, _, _), result in zip(uploads, results) if result.error is None])
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=failed)
+    digests = [result.sha256 for result in results]
+    for attempt in range(2):
+        try:
+            photo_ids, new_ids, duplicate_keys = _insert_uploaded_photos(db, files, uploads, digests, chunk_size)
+            break
+        except IntegrityError:
+            # A concurrent request stored the same content first: resolve
+            # against its row on the second pass.
+            db.rollback()
+            if attempt:
+                delete_keys(s3, bucket, [key for key, _, _ in uploads])
+                raise
+    # Duplicates point at the existing object, so their fresh copies go.
+    delete_keys(s3, bucket, duplicate_keys)
+    # Enqueue Celery tasks for detection once the rows are visible to workers,
+    # PROCESS_BATCH_SIZE photos per task.
+    batch_size = max(1, int(os.getenv("PROCESS_BATCH_SIZE", "10")))
+    for start in range(0, len(new_ids), batch_size):
+        batch = new_ids[start : start + batch_size]
+        if len(batch) == 1:
+            celery_app.celery_app.send_task("worker.tasks.process_photo", args=[batch[0]])
+        else:
+            celery_app.celery_app.send_task("worker.tasks.process_photos_batch", args=[batch])
+    return photo_ids
 
 
 @app.get("/photos", response_model=List[schemas.PhotoResponse])
 def list_photos(
-    status: Optional[models.PhotoStatus] = None,
+    response: Response,
+    # Aliased so that the parameters do not shadow `fastapi.status` and the
+    # `consent` module inside the handler.
+    status_filter: Optional[models.PhotoStatus] = Query(None, alias="status"),
+    consent_filter: Optional[models.ConsentSummary] = Query(None, alias="consent"),
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
-    """List photos optionally filtered by status."""
-    query = db.query(models.Photo)
-    if status:
-        query = query.filter(models.Photo.status == status)
-    photos = query.order_by(models.Photo.upload_time.desc()).all()
+    """
+    List photos, newest first, one page at a time.
+
+    Optional filters restrict the listing by processing status, consent
+    state of the photo's faces and upload date range. When more photos
+    follow, the `X-Next-Cursor` response header holds the value to pass as
+    `cursor` to fetch the next page.
+    """
+    stmt = pagination.photo_page_statement(
+        limit, cursor, status_filter, consent_filter, uploaded_after, uploaded_before
+    )
+    # Load the faces of the whole page in one extra query instead of one per photo.
+    stmt = stmt.options(selectinload(models.Photo.faces))
+    photos, next_cursor = pagination.split_page(db.execute(stmt).scalars().all(), limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return photos
 
 
 @app.get("/photos/{photo_id}", response_model=schemas.PhotoResponse)
 def get_photo(photo_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
     """Retrieve a single photo and its faces."""
-    photo = db.query(models.Photo).filter(models.Photo.id == photo_id).first()
+    photo = (
+        db.query(models.Photo)
+        .options(selectinload(models.Photo.faces))
+        .filter(models.Photo.id == photo_id)
+        .first()
+    )
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
     return photo
@@ -234,11 +320,24 @@ def update_consent(
     current_user: models.User = Depends(auth.get_current_user),
 ):
     """Update the consent status of a face."""
-    face = db.query(models.Face).filter(models.Face.id == face_id, models.Face.photo_id == photo_id).first()
+    # Lock the face so that concurrent updates read each other's status
+    # and the photo's counters move by one delta per actual change.
+    face = (
+        db.query(models.Face)
+        .filter(models.Face.id == face_id, models.Face.photo_id == photo_id)
+        .with_for_update()
+        .first()
+    )
     if not face:
         raise HTTPException(status_code=404, detail="Face not found")
+    consent.record_change(db, photo_id, face.consent_status, payload.consent_status)
     face.consent_status = payload.consent_status
+    # Any consent change may alter which faces must be hidden: invalidate the
+    # blurred variant and let a worker rebuild it in the background.
+    variants.mark_stale(db, photo_id)
     db.commit()
+    if variants.boxes_to_blur(face.photo.faces):
+        celery_app.celery_app.send_task("worker.tasks.generate_blur", args=[photo_id])
     db.refresh(face)
     return face
 
@@ -250,6 +349,7 @@ def update_consent(
 @app.post("/photos/{photo_id}/blur")
 def queue_blur(
     photo_id: int,
+    mode: Optional[schemas.RedactionMode] = None,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
@@ -257,17 +357,57 @@ def queue_blur(
     Queue a background task to generate a blurred version of the specified photo.
 
     The task will blur all faces that do not have an approved consent and save
-    the blurred image in the same S3 bucket with a `_blur` suffix. This
-    endpoint returns immediately after queuing the task.
+    the blurred image in the same S3 bucket next to the original. `mode`
+    selects the redaction style; it is kept for the photo's later rebuilds
+    and, until one is chosen, `REDACTION_MODE` applies. This endpoint
+    returns immediately after queuing the task.
     """
     photo = db.query(models.Photo).filter(models.Photo.id == photo_id).first()
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
     # Enqueue Celery task
-    celery_app.celery_app.send_task("worker.tasks.generate_blur", args=[photo_id])
+    celery_app.celery_app.send_task(
+        "worker.tasks.generate_blur", args=[photo_id, mode.value if mode else None]
+    )
     return {"detail": "Blur task enqueued"}
 
 
+def _rendition_url(db: Session, photo_id: int, name: str) -> dict:
+    photo = db.query(models.Photo).filter(models.Photo.id == photo_id).first()
+    if not photo:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    if not photo.has_renditions:
+        raise HTTPException(status_code=404, detail="Rendition not available")
+    bucket = os.getenv("S3_BUCKET", "photos")
+    return {"url": generate_presigned_url(bucket, renditions.rendition_key(photo.s3_key, name), expires_in=3600)}
+
+
+@app.get("/photos/{photo_id}/thumbnail_url")
+def get_thumbnail_url(
+    photo_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """
+    Return a pre‑signed URL for the grid thumbnail of a photo, valid for one hour.
+
+    Renditions are generated by the worker while the photo is processed; a
+    404 response means they are not available (yet), in which case clients
+    can fall back to `/photos/{photo_id}/url`.
+    """
+    return _rendition_url(db, photo_id, renditions.THUMB)
+
+
+@app.get("/photos/{photo_id}/preview_url")
+def get_preview_url(
+    photo_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """Return a pre‑signed URL for the detail-page preview of a photo (see `get_thumbnail_url`)."""
+    return _rendition_url(db, photo_id, renditions.PREVIEW)
+
+
 @app.get("/photos/{photo_id}/blurred_url")
 def get_blurred_url(
     photo_id: int,
@@ -277,26 +417,74 @@ def get_blurred_url(
     """
     Return a pre‑signed URL for the blurred version of a photo if it exists.
 
-    The blurred image is expected to be stored in the same S3 bucket with the
-    `_blur` suffix on the key. If the blurred image is not found, a 404
-    response is returned. Note that this endpoint does not trigger blur
-    generation; use POST /photos/{photo_id}/blur to enqueue the blur task.
+    Only a variant built from the current consents is served. If no blurred
+    image was ever built, a 404 response is returned; use
+    POST /photos/{photo_id}/blur to enqueue the blur task. If consents
+    changed since it was built, the variant may show a face that must now be
+    hidden: a regeneration task is enqueued and a 409 response is returned.
     """
-    photo = db.query(models.Photo).filter(models.Photo.id == photo_id).first()
+    photo = (
+        db.query(models.Photo)
+        .options(selectinload(models.Photo.faces), selectinload(models.Photo.blurred_variant))
+        .filter(models.Photo.id == photo_id)
+        .first()
+    )
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
+    variant = photo.blurred_variant
+    if variant is None or variant.s3_key is None:
+        raise HTTPException(status_code=404, detail="Blurred image not found")
+    if not variants.is_current(variant, photo.faces):
+        celery_app.celery_app.send_task("worker.tasks.generate_blur", args=[photo_id])
+        raise HTTPException(status_code=409, detail="Blurred image is out of date; regeneration queued")
     bucket = os.getenv("S3_BUCKET", "photos")
-    blur_key = f"{photo.s3_key.rsplit('.', 1)[0]}_blur.jpg"
     s3 = get_s3_client()
     # Check if blurred object exists
     try:
-        s3.head_object(Bucket=bucket, Key=blur_key)
+        s3.head_object(Bucket=bucket, Key=variant.s3_key)
     except Exception:
         raise HTTPException(status_code=404, detail="Blurred image not found")
-    url = generate_presigned_url(bucket, blur_key, expires_in=3600)
+    url = generate_presigned_url(bucket, variant.s3_key, expires_in=3600)
     return {"url": url}
 
 
+def stream_objects_as_zip(bucket: str, entries: Iterable[Tuple[str, str]], download_name: str, headers: Optional[dict] = None):
+    """
+    Return a streaming ZIP response built from `(s3_key, filename)` pairs.
+
+    The next `EXPORT_PREFETCH_WINDOW` objects download concurrently while the
+    current one is written, and entry order follows `entries`. Objects larger
+    than `EXPORT_PREFETCH_MAX_BYTES` are not buffered: the open response is
+    handed to the writer and streamed in `EXPORT_CHUNK_SIZE` pieces. Objects
+    that cannot be read are skipped.
+    """
+    s3 = get_s3_client()
+    max_prefetch_bytes = int(os.getenv("EXPORT_PREFETCH_MAX_BYTES", str(32 * 1024 * 1024)))
+
+    def fetch(entry):
+        try:
+            obj = s3.get_object(Bucket=bucket, Key=entry[0])
+        except Exception:
+            return None
+        if obj.get("ContentLength", 0) > max_prefetch_bytes:
+            return iter_object_chunks(obj)
+        try:
+            return [obj["Body"].read()]
+        except Exception:
+            return None
+
+    def archive_entries():
+        for (_, filename), chunks in prefetch(fetch, entries):
+            if chunks is not None:
+                yield filename, chunks
+
+    return StreamingResponse(
+        stream_zip(archive_entries()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={download_name}", **(headers or {})},
+    )
+
+
 @app.get("/export/privacy-safe")
 def export_privacy_safe(
     db: Session = Depends(database.get_db),
@@ -304,87 +492,54 @@ def export_privacy_safe(
 ):
     """
     Generate a ZIP archive containing blurred versions of photos with pending or
-    rejected consents. For each photo, faces without approved consent are
-    blurred. The blurred images are generated on the fly and not saved back
-    to S3. This may take several seconds depending on the number of photos.
+    rejected consents.
+
+    Nothing is blurred on the request path: the archive streams the blurred
+    variants precomputed by the worker. Photos whose variant is missing or
+    stale are left out, a regeneration task is enqueued for each of them and
+    their number is reported in the `X-Blur-Pending` response header.
     """
     bucket = os.getenv("S3_BUCKET", "photos")
-    photos = db.query(models.Photo).all()
-    mem_zip = io.BytesIO()
-    with zipfile.ZipFile(mem_zip, "w", zipfile.ZIP_DEFLATED) as zf:
-        s3 = get_s3_client()
-        for photo in photos:
-            # Determine if any face lacks approval
-            if not photo.faces:
-                continue
-            needs_blur = any(
-                face.consent_status != models.ConsentStatus.APPROVED for face in photo.faces
-            )
-            if not needs_blur:
-                continue
-            # Download image
-            try:
-                obj = s3.get_object(Bucket=bucket, Key=photo.s3_key)
-                original_data = obj["Body"].read()
-            except Exception:
-                continue
-            # Open image
-            try:
-                img = Image.open(io.BytesIO(original_data)).convert("RGB")
-            except Exception:
-                continue
-            # Collect boxes to blur
-            boxes = [face.bbox for face in photo.faces if face.consent_status != models.ConsentStatus.APPROVED]
-            if boxes:
-                blurred_img = blur_faces_in_image(img, boxes)
-            else:
-                blurred_img = img
-            buffer = io.BytesIO()
-            blurred_img.save(buffer, format="JPEG")
-            buffer.seek(0)
-            zf.writestr(f"{photo.filename}", buffer.read())
-    mem_zip.seek(0)
-    from fastapi.responses import StreamingResponse
-    return StreamingResponse(
-        mem_zip,
-        media_type="application/zip",
-        headers={"Content-Disposition": "attachment; filename=privacy_safe_photos.zip"},
+    # Resolve everything needed from the database before streaming starts:
+    # the session is closed once the response has been returned.
+    entries = []
+    pending = 0
+    for row in exports.iter_to_blur(db):
+        if exports.has_current_variant(row):
+            entries.append((row.variant.s3_key, row.filename))
+        else:
+            pending += 1
+            celery_app.celery_app.send_task("worker.tasks.generate_blur", args=[row.photo_id])
+    return stream_objects_as_zip(
+        bucket, entries, "privacy_safe_photos.zip", headers={"X-Blur-Pending": str(pending)}
     )
 
 
 @app.get("/export/approved")
-def export_approved(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def export_approved(current_user: models.User = Depends(auth.get_current_user)):
     """
     Generate a ZIP archive containing all photos where every face is approved or
     there are no faces. Photos with any pending/rejected faces are excluded.
-    Returns the ZIP as a streaming response.
+
+    The archive is streamed while objects are prefetched from S3 with bounded
+    concurrency, so memory use is bounded by the prefetch window rather than
+    by the size of the export. The selection itself is read lazily from a
+    server-side cursor as the archive is written.
     """
     bucket = os.getenv("S3_BUCKET", "photos")
-    all_photos = db.query(models.Photo).all()
-    approved_photos = []
-    for photo in all_photos:
-        if not photo.faces:
-            approved_photos.append(photo)
-            continue
-        all_approved = all(face.consent_status == models.ConsentStatus.APPROVED for face in photo.faces)
-        if all_approved:
-            approved_photos.append(photo)
-    # Create zip in memory
-    mem_zip = io.BytesIO()
-    with zipfile.ZipFile(mem_zip, "w", zipfile.ZIP_DEFLATED) as zf:
-        s3 = get_s3_client()
-        for photo in approved_photos:
-            obj = s3.get_object(Bucket=bucket, Key=photo.s3_key)
-            data = obj["Body"].read()
-            # Use original filename for clarity
-            zf.writestr(photo.filename, data)
-    mem_zip.seek(0)
-    from fastapi.responses import StreamingResponse
-    return StreamingResponse(
-        mem_zip,
-        media_type="application/zip",
-        headers={"Content-Disposition": "attachment; filename=approved_photos.zip"},
-    )
+
+    def approved_entries():
+        # Runs while the response streams, after the request's session has
+        # been closed, hence a session of its own.
+        db = database.SessionLocal()
+        try:
+            for row in exports.iter_approved(db):
+                # Use original filename for clarity
+                yield row.s3_key, row.filename
+        finally:
+            db.close()
+
+    return stream_objects_as_zip(bucket, approved_entries(), "approved_photos.zip")
 
 
 @app.post("/client/search")
@@ -398,8 +553,15 @@ def client_search(file: UploadFile = File(...), db: Session = Depends(database.g
     rekog = get_rekognition_client()
     bucket = os.getenv("S3_BUCKET", "photos")
     collection_id = get_collection_id()
-    # Read selfie into memory
-    image_bytes = file.file.read()
+    # Rekognition accepts at most 5 MB of image bytes: read no more than that
+    # so an oversized upload cannot make the API buffer it whole.
+    max_bytes = int(os.getenv("SEARCH_MAX_IMAGE_BYTES", str(5 * 1024 * 1024)))
+    image_bytes = file.file.read(max_bytes + 1)
+    if len(image_bytes) > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Selfie larger than {max_bytes} bytes",
+        )
     try:
         response = rekog.search_faces_by_image(
             CollectionId=collection_id,
@@ -424,4 +586,25 @@ def client_search(file: UploadFile = File(...), db: Session = Depends(database.g
             continue
         url = generate_presigned_url(bucket, photo.s3_key, expires_in=3600)
         results.append({"photo_id": pid, "url": url})
-    return results
\ No newline at end of file
+    return results
+
+
+@app.get("/metrics/db-pool")
+def db_pool_metrics(current_user: models.User = Depends(auth.get_current_user)):
+    """
+    Report the state of this process's database connection pools.
+
+    Includes the settings the pool runs with, occupancy (connections checked
+    out, idle and in overflow), connection churn and a histogram of how
+    long checkouts waited for a free connection. Counters are cumulative
+    since the process started. The pool of the async engine, once the
+    async routes have created it, is reported the same way under `async`.
+    """
+    metrics = {
+        "role": database.get_process_role(),
+        "settings": database.pool_metrics.settings(),
+        **database.pool_metrics.snapshot(),
+    }
+    if async_io.pool_metrics.pool is not None:
+        metrics["async"] = {"settings": async_io.pool_metrics.settings(), **async_io.pool_metrics.snapshot()}
+    return metrics
@@ -0,0 +1,60 @@
+"""
+In-place schema upgrades.
+
+The schema is created with `Base.metadata.create_all`, which creates
+missing tables but never alters tables that already exist. `upgrade`
+brings an existing database up to date with the models: it adds the
+columns and indexes that are missing from existing tables, in one
+transaction, and reports what it added so that callers can backfill the
+new columns. Every step is idempotent, so it runs on each startup.
+
+Only additive changes are handled. New columns must be nullable or carry
+a server default so that they can be added to tables that hold rows;
+foreign keys of added columns are not created on existing tables.
+"""
+from typing import Set, Tuple
+
+from sqlalchemy import Enum, inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from . import models
+
+
+def _add_column(connection: Connection, table, column) -> None:
+    if isinstance(column.type, Enum):
+        # PostgreSQL stores enums as named types that must exist first.
+        column.type.create(connection, checkfirst=True)
+    ddl = str(CreateColumn(column).compile(dialect=connection.dialect))
+    # PostgreSQL can skip columns added meanwhile by another process; other
+    # backends rely on the inspection done beforehand.
+    if_not_exists = "IF NOT EXISTS " if connection.dialect.name == "postgresql" else ""
+    table_name = connection.dialect.identifier_preparer.format_table(table)
+    connection.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {if_not_exists}{ddl}")
+
+
+def upgrade(engine: Engine) -> Set[Tuple[str, str]]:
+    """
+    Create missing tables, columns and indexes; return the `(table, column)` pairs added.
+
+    Columns added to tables that hold rows start out with their server
+    default (or NULL): backfilling them is up to the caller.
+    """
+    added = set()
+    with engine.begin() as connection:
+        existing = set(inspect(connection).get_table_names())
+        models.Base.metadata.create_all(bind=connection)
+        inspector = inspect(connection)
+        for table in models.Base.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    _add_column(connection, table, column)
+                    added.add((table.name, column.name))
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+    return added
@@ -9,15 +9,19 @@ import enum
 from datetime import datetime
 
 from sqlalchemy import (
+    BigInteger,
+    Boolean,
     Column,
     Integer,
     String,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     JSON,
 )
 from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.sql import false
 
 
 Base = declarative_base()
@@ -35,6 +39,14 @@ class ConsentStatus(str, enum.Enum):
     REJECTED = "rejected"
 
 
+class ConsentSummary(str, enum.Enum):
+    """Consent state of a photo as a whole, derived from its faces."""
+    NO_FACES = "no_faces"  # nothing to consent to
+    APPROVED = "approved"  # every face approved
+    PENDING = "pending"  # some face pending, none rejected
+    REJECTED = "rejected"  # at least one face rejected
+
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -61,10 +73,44 @@ class Photo(Base):
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     s3_key = Column(String, nullable=False, unique=True)
+    # SHA-256 of the original bytes, used to short-circuit re-uploads.
+    content_sha256 = Column(String(64), nullable=True, unique=True, index=True)
     upload_time = Column(DateTime, default=datetime.utcnow)
     status = Column(Enum(PhotoStatus), default=PhotoStatus.IN_QUEUE, nullable=False)
+    # 64-bit perceptual hash and its four 16-bit chunks (see `phash`); the
+    # chunks are indexed individually for multi-index Hamming lookups.
+    phash = Column(BigInteger, nullable=True)
+    phash_0 = Column(Integer, nullable=True, index=True)
+    phash_1 = Column(Integer, nullable=True, index=True)
+    phash_2 = Column(Integer, nullable=True, index=True)
+    phash_3 = Column(Integer, nullable=True, index=True)
+    # Burst sibling whose faces were reused instead of running detection.
+    near_duplicate_of = Column(Integer, ForeignKey("photos.id"), nullable=True, index=True)
+    # Thumbnail and preview stored beside the original (see `renditions`).
+    has_renditions = Column(Boolean, default=False, server_default=false(), nullable=False)
+    # Face counts by consent state and their summary, kept in step with the
+    # faces table (see `consent`).
+    face_count = Column(Integer, default=0, server_default="0", nullable=False)
+    approved_count = Column(Integer, default=0, server_default="0", nullable=False)
+    pending_count = Column(Integer, default=0, server_default="0", nullable=False)
+    rejected_count = Column(Integer, default=0, server_default="0", nullable=False)
+    consent_summary = Column(
+        Enum(ConsentSummary),
+        default=ConsentSummary.NO_FACES,
+        server_default=ConsentSummary.NO_FACES.name,
+        nullable=False,
+    )
 
     faces = relationship("Face", back_populates="photo", cascade="all,delete-orphan")
+    blurred_variant = relationship(
+        "BlurredVariant", back_populates="photo", uselist=False, cascade="all,delete-orphan"
+    )
+
+    # Back keyset pagination on (upload_time, id), optionally by status.
+    __table_args__ = (
+        Index("ix_photos_upload_time_id", "upload_time", "id"),
+        Index("ix_photos_status_upload_time_id", "status", "upload_time", "id"),
+    )
 
 
 class Face(Base):
@@ -76,4 +122,42 @@ class Face(Base):
     name = Column(String, nullable=True)
     consent_status = Column(Enum(ConsentStatus), default=ConsentStatus.PENDING, nullable=False)
 
-    photo = relationship("Photo", back_populates="faces")
\ No newline at end of file
+    photo = relationship("Photo", back_populates="faces")
+
+    # Serves per-photo consent lookups (EXISTS subqueries on consent state).
+    __table_args__ = (Index("ix_faces_photo_id_consent_status", "photo_id", "consent_status"),)
+
+
+# One partial index per consent state, in listing order: filtering the
+# dashboard or planning an export by consent scans only matching photos.
+for _summary in ConsentSummary:
+    _condition = Photo.consent_summary == _summary
+    Index(
+        f"ix_photos_consent_{_summary.value}_upload_time_id",
+        Photo.upload_time,
+        Photo.id,
+        postgresql_where=_condition,
+        sqlite_where=_condition,
+    )
+del _summary, _condition
+
+
+class BlurredVariant(Base):
+    """
+    Materialized blurred copy of a photo.
+
+    `consent_fingerprint` identifies the set of non-approved faces the
+    object in `s3_key` was built from. Consent changes flip `is_stale` and
+    a worker regenerates the object in the background. `mode` is the
+    redaction mode chosen for this photo; NULL follows `REDACTION_MODE`.
+    """
+    __tablename__ = "blurred_variants"
+    id = Column(Integer, primary_key=True, index=True)
+    photo_id = Column(Integer, ForeignKey("photos.id"), unique=True, nullable=False)
+    s3_key = Column(String, nullable=True)
+    consent_fingerprint = Column(String, nullable=True)
+    mode = Column(String, nullable=True)
+    is_stale = Column(Boolean, default=True, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    photo = relationship("Photo", back_populates="blurred_variant")
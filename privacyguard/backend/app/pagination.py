@@ -0,0 +1,69 @@
+"""
+Keyset pagination and filtering for photo listings.
+
+Pages are ordered by `(upload_time, id)` descending and the position is
+carried in an opaque cursor holding the last row's key, so fetching page N
+costs the same index range scan as fetching page 1 (no OFFSET). The
+statement built here is shared by the sync and async list endpoints.
+"""
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+from sqlalchemy.sql import Select
+
+from . import models
+
+
+def encode_cursor(photo: models.Photo) -> str:
+    """Return the cursor pointing just after `photo`."""
+    raw = f"{photo.upload_time.isoformat()}|{photo.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Return the `(upload_time, id)` key of a cursor, or raise a 400 error."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        upload_time, photo_id = raw.split("|")
+        return datetime.fromisoformat(upload_time), int(photo_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def photo_page_statement(
+    limit: int,
+    cursor: Optional[str] = None,
+    status: Optional[models.PhotoStatus] = None,
+    consent: Optional[models.ConsentSummary] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+) -> Select:
+    """
+    Build the SELECT for one page of photos.
+
+    One row more than `limit` is requested so that the caller can tell
+    whether another page follows (see `split_page`).
+    """
+    stmt = select(models.Photo)
+    if status:
+        stmt = stmt.where(models.Photo.status == status)
+    if consent:
+        stmt = stmt.where(models.Photo.consent_summary == consent)
+    if uploaded_after:
+        stmt = stmt.where(models.Photo.upload_time >= uploaded_after)
+    if uploaded_before:
+        stmt = stmt.where(models.Photo.upload_time < uploaded_before)
+    if cursor:
+        stmt = stmt.where(tuple_(models.Photo.upload_time, models.Photo.id) < tuple_(*decode_cursor(cursor)))
+    return stmt.order_by(models.Photo.upload_time.desc(), models.Photo.id.desc()).limit(limit + 1)
+
+
+def split_page(rows: list, limit: int) -> Tuple[list, Optional[str]]:
+    """Return the rows of the page and the cursor of the next one, if any."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
@@ -0,0 +1,124 @@
+"""
+Perceptual hashing for near-duplicate photo detection.
+
+Burst shots differ by a few pixels, which changes their SHA-256 but not
+their difference hash (dHash): a 64-bit fingerprint of the brightness
+gradients of a 9x8 thumbnail. Two photos are near duplicates when the
+Hamming distance between their hashes is small.
+
+Lookups use multi-index hashing. The hash is split into four 16-bit
+chunks stored in separately indexed columns; by the pigeonhole principle
+two hashes within distance 3 share at least one chunk exactly, so a query
+for rows equal on any chunk followed by an exact distance check finds
+every match with four index probes, regardless of table size.
+
+Reusing a sibling's faces skips detection on the strength of the hash
+alone, which misses a face that moved or stepped into the frame between
+shots, so it is off unless `PHASH_MAX_DISTANCE` is set.
+"""
+import os
+from typing import Optional
+
+from PIL import Image
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session, selectinload
+
+from . import models
+
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+# Largest distance for which the chunk lookup is guaranteed to be exact.
+EXACT_MAX_DISTANCE = CHUNKS - 1
+
+
+def dhash(image: Image.Image) -> int:
+    """Return the 64-bit difference hash of an image as an unsigned int."""
+    # For JPEGs, draft() lets the decoder downscale by up to 8x via DCT
+    # scaling, which makes hashing a large photo cheap.
+    image.draft("L", (64, 64))
+    small = image.convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    """Return the number of differing bits between two hashes."""
+    return bin((a ^ b) & ((1 << HASH_BITS) - 1)).count("1")
+
+
+def to_signed(value: int) -> int:
+    """Map an unsigned 64-bit hash onto the range of a signed BIGINT column."""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value: int) -> int:
+    """Inverse of `to_signed`."""
+    return value & ((1 << HASH_BITS) - 1)
+
+
+def split(value: int) -> list:
+    """Return the 16-bit chunks of a hash, most significant first."""
+    mask = (1 << CHUNK_BITS) - 1
+    return [(value >> (CHUNK_BITS * (CHUNKS - 1 - i))) & mask for i in range(CHUNKS)]
+
+
+def assign(photo: models.Photo, value: int) -> None:
+    """Store a hash and its lookup chunks on a photo."""
+    photo.phash = to_signed(value)
+    photo.phash_0, photo.phash_1, photo.phash_2, photo.phash_3 = split(value)
+
+
+def get_max_distance() -> int:
+    """Return `PHASH_MAX_DISTANCE`, the largest distance treated as a near duplicate (default -1, disabled)."""
+    return int(os.getenv("PHASH_MAX_DISTANCE", "-1"))
+
+
+def get_max_candidates() -> int:
+    """Return `PHASH_MAX_CANDIDATES`, the most recent chunk matches compared by `find_near_duplicate`."""
+    return max(1, int(os.getenv("PHASH_MAX_CANDIDATES", "200")))
+
+
+def find_near_duplicate(
+    db: Session, value: int, exclude_id: Optional[int] = None, max_distance: Optional[int] = None
+) -> Optional[models.Photo]:
+    """
+    Return the processed photo whose hash is closest to `value`, if any, with its faces loaded.
+
+    Only photos within `max_distance` (default `PHASH_MAX_DISTANCE`) are
+    considered. Up to distance 3 the search is exact; above that, matches
+    that share no chunk with `value` are missed. A distance below 0
+    disables the search. Low-detail images (flat or dark frames) share
+    chunks with many photos, so only the `PHASH_MAX_CANDIDATES` most recent
+    chunk matches are compared, reading just their ids and hashes.
+    """
+    if max_distance is None:
+        max_distance = get_max_distance()
+    if max_distance < 0:
+        return None
+    chunks = split(value)
+    columns = [models.Photo.phash_0, models.Photo.phash_1, models.Photo.phash_2, models.Photo.phash_3]
+    stmt = select(models.Photo.id, models.Photo.phash).where(
+        or_(*(column == chunk for column, chunk in zip(columns, chunks))),
+        models.Photo.status == models.PhotoStatus.PROCESSED,
+    )
+    if exclude_id is not None:
+        stmt = stmt.where(models.Photo.id != exclude_id)
+    stmt = stmt.order_by(models.Photo.id.desc()).limit(get_max_candidates())
+    best_id = None
+    best_distance = max_distance
+    for photo_id, candidate in db.execute(stmt):
+        distance = hamming(value, to_unsigned(candidate))
+        # Newest first: on ties the older photo, the first of the burst, wins.
+        if distance <= best_distance:
+            best_id, best_distance = photo_id, distance
+    if best_id is None:
+        return None
+    return db.get(models.Photo, best_id, options=[selectinload(models.Photo.faces)])
@@ -0,0 +1,146 @@
+"""
+Connection pool instrumentation.
+
+`PoolMetrics` listens to the pool events of an engine and keeps running
+counters of connection churn (connections opened, closed and invalidated)
+and checkouts. `InstrumentedQueuePool` additionally times how long each
+checkout waited for a free connection, which is the number that tells
+whether a pool is undersized: occupancy alone cannot distinguish a busy
+pool from a saturated one. `snapshot()` returns everything as a plain dict
+for the `/metrics/db-pool` endpoint, and `settings()` the configuration the
+pool actually runs with.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+# Upper bounds, in seconds, of the checkout wait histogram buckets.
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class PoolMetrics:
+    """Thread-safe counters describing the activity of one connection pool."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.pool: Optional[Pool] = None
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.connections_invalidated = 0
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def attach(self, pool: Pool) -> None:
+        """Start collecting events from `pool`."""
+        self.pool = pool
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "close", self._on_close)
+        event.listen(pool, "close_detached", self._on_close)
+        event.listen(pool, "invalidate", self._on_invalidate)
+        event.listen(pool, "checkout", self._on_checkout)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def _on_close(self, dbapi_connection, *args) -> None:
+        with self._lock:
+            self.connections_closed += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        with self._lock:
+            self.connections_invalidated += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        with self._lock:
+            self.checkouts += 1
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        """Account for one checkout that waited `seconds` for a connection."""
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            self.wait_histogram[bisect_left(WAIT_BUCKETS, seconds)] += 1
+
+    def settings(self) -> dict:
+        """Return the settings of the attached pool, as read back from the pool itself."""
+        pool = self.pool
+        if pool is None:
+            return {}
+        data = {"pool_class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            data.update(pool_size=pool.size(), max_overflow=pool._max_overflow, pool_timeout=pool._timeout)
+        data.update(pool_recycle=pool._recycle, pool_pre_ping=pool._pre_ping)
+        return data
+
+    def snapshot(self) -> dict:
+        """Return the current counters and pool occupancy."""
+        with self._lock:
+            waits = sum(self.wait_histogram)
+            data = {
+                "connections_opened": self.connections_opened,
+                "connections_closed": self.connections_closed,
+                "connections_invalidated": self.connections_invalidated,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "checkout_wait": {
+                    "count": waits,
+                    "sum_seconds": self.wait_seconds_total,
+                    "max_seconds": self.wait_seconds_max,
+                    "mean_seconds": self.wait_seconds_total / waits if waits else 0.0,
+                    "buckets": {
+                        **{f"le_{bound}": count for bound, count in zip(WAIT_BUCKETS, self.wait_histogram)},
+                        "le_inf": self.wait_histogram[-1],
+                    },
+                },
+            }
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            data.update(
+                pool_size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(0, pool.overflow()),
+                max_overflow=pool._max_overflow,
+            )
+        return data
+
+
+class InstrumentedQueuePool(QueuePool):
+    """`QueuePool` that reports checkout wait times to a `PoolMetrics`."""
+
+    def __init__(self, creator, metrics: Optional[PoolMetrics] = None, **kw) -> None:
+        super().__init__(creator, **kw)
+        self.metrics = metrics or PoolMetrics()
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # Called when the engine invalidates the whole pool (e.g. after the
+        # database restarted): keep reporting to the same metrics.
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        self.metrics.pool = pool
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """`InstrumentedQueuePool` for engines created with `create_async_engine`."""
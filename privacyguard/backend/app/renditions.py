@@ -0,0 +1,61 @@
+"""
+Reduced-size renditions of photos for browsing.
+
+The worker renders a grid thumbnail and a detail-page preview of every
+photo right after detection and stores them beside the original, e.g.
+`abc.jpg` gets `abc_thumb.jpg` and `abc_preview.jpg`. Listing pages then
+download a few kilobytes per photo instead of the full original.
+
+Sizes are the long edge in pixels, from `RENDITION_THUMB_EDGE` (default
+320) and `RENDITION_PREVIEW_EDGE` (default 1600). EXIF metadata is carried
+over so that browsers orient renditions like the original, which keeps
+face boxes drawn over a preview aligned.
+"""
+import io
+import os
+from typing import Dict
+
+from PIL import Image
+
+
+THUMB = "thumb"
+PREVIEW = "preview"
+NAMES = (THUMB, PREVIEW)
+JPEG_QUALITY = 85
+
+
+def get_sizes() -> Dict[str, int]:
+    """Return the long edge of each rendition, largest first."""
+    sizes = {
+        PREVIEW: int(os.getenv("RENDITION_PREVIEW_EDGE", "1600")),
+        THUMB: int(os.getenv("RENDITION_THUMB_EDGE", "320")),
+    }
+    return dict(sorted(sizes.items(), key=lambda item: -item[1]))
+
+
+def rendition_key(s3_key: str, name: str) -> str:
+    """Return the S3 key under which rendition `name` of `s3_key` is stored."""
+    return f"{s3_key.rsplit('.', 1)[0]}_{name}.jpg"
+
+
+def render(data: bytes) -> Dict[str, bytes]:
+    """
+    Return every rendition of an encoded image as JPEG bytes, keyed by name.
+
+    The image is decoded once, at the reduced scale the largest rendition
+    allows for JPEGs, and each smaller rendition is derived from the
+    previous one. Renditions are never larger than the original.
+    """
+    sizes = get_sizes()
+    image = Image.open(io.BytesIO(data))
+    exif = image.info.get("exif")
+    largest = max(sizes.values())
+    image.draft("RGB", (largest, largest))
+    image = image.convert("RGB")
+    result = {}
+    for name, edge in sizes.items():
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True, **({"exif": exif} if exif else {}))
+        result[name] = buffer.getvalue()
+    return result
@@ -5,12 +5,13 @@ These models validate input data and serialise database objects for
 responses. Separating the database models from the schemas prevents
 exposing internal fields and enforces strict typing at the API layer.
 """
+import enum
 from datetime import datetime
 from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
-from .models import ConsentStatus, PhotoStatus
+from .models import ConsentStatus, ConsentSummary, PhotoStatus
 
 
 class Token(BaseModel):
@@ -54,6 +55,8 @@ class PhotoResponse(BaseModel):
     filename: str
     status: PhotoStatus
     upload_time: datetime
+    face_count: int = 0
+    consent_summary: ConsentSummary = ConsentSummary.NO_FACES
     faces: List[FaceResponse] = []
 
     class Config:
@@ -68,6 +71,13 @@ class ConsentUpdate(BaseModel):
     consent_status: ConsentStatus
 
 
+class RedactionMode(str, enum.Enum):
+    GAUSSIAN = "gaussian"
+    BOX = "box"
+    PIXELATE = "pixelate"
+    FILL = "fill"
+
+
 class LoginRequest(BaseModel):
     username: str
     password: str
\ No newline at end of file
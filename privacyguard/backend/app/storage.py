@@ -0,0 +1,219 @@
+"""
+Object storage helpers shared by the API and the worker.
+
+The functions here sit on top of a boto3 S3 client and implement the
+access patterns that the endpoints need beyond single `get_object` /
+`put_object` calls: provisioning the bucket once per process, uploading
+many files concurrently and prefetching many objects concurrently while
+preserving the order in which they are consumed.
+"""
+import hashlib
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# An upload: destination key, readable file object and content type.
+Upload = Tuple[str, BinaryIO, str]
+
+
+class HashingReader:
+    """
+    Read-only, non-seekable view of a file object that hashes what is read.
+
+    Being non-seekable makes the S3 transfer manager read the source strictly
+    once and in order, so `hexdigest()` is the SHA-256 of the whole content
+    once the upload has completed.
+    """
+
+    def __init__(self, fileobj: BinaryIO) -> None:
+        self._fileobj = fileobj
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self._hash.update(data)
+        self.size += len(data)
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class UploadResult(NamedTuple):
+    """Outcome of one upload: content digest and size, or the error raised."""
+
+    sha256: Optional[str]
+    size: int
+    error: Optional[Exception]
+
+
+# Buckets known to exist. Only positive results are cached, so a bucket that
+# could not be checked (e.g. storage still starting) is retried next time.
+_ready_buckets = set()
+_bucket_lock = threading.Lock()
+
+
+def ensure_bucket(client, bucket: str) -> None:
+    """
+    Make sure `bucket` exists, creating it if necessary.
+
+    The first call per process issues a `HeadBucket` (and a `CreateBucket`
+    if it is missing); later calls return without any request. Errors are
+    not raised: if the bucket really is unusable the subsequent PUT fails
+    with a meaningful error.
+    """
+    if bucket in _ready_buckets:
+        return
+    with _bucket_lock:
+        if bucket in _ready_buckets:
+            return
+        try:
+            client.head_bucket(Bucket=bucket)
+        except ClientError as exc:
+            code = exc.response.get("Error", {}).get("Code")
+            if code == "403":
+                # The bucket exists but this principal may not inspect it.
+                _ready_buckets.add(bucket)
+                return
+            if code not in ("404", "NoSuchBucket", "NotFound"):
+                return
+            try:
+                client.create_bucket(Bucket=bucket)
+            except client.exceptions.BucketAlreadyOwnedByYou:
+                pass
+            except client.exceptions.BucketAlreadyExists:
+                pass
+            except Exception:
+                return
+        except Exception:
+            return
+        _ready_buckets.add(bucket)
+
+
+def get_transfer_config() -> TransferConfig:
+    """
+    Return the transfer settings for file uploads.
+
+    Files above `UPLOAD_MULTIPART_THRESHOLD` bytes are sent as a multipart
+    upload in `UPLOAD_MULTIPART_CHUNKSIZE` parts, `UPLOAD_PART_CONCURRENCY`
+    at a time. No more parts than that are buffered, so one upload holds at
+    most `UPLOAD_PART_CONCURRENCY * UPLOAD_MULTIPART_CHUNKSIZE` bytes in
+    memory whatever the file size.
+    """
+    mib = 1024 * 1024
+    part_concurrency = int(os.getenv("UPLOAD_PART_CONCURRENCY", "2"))
+    config = TransferConfig(
+        multipart_threshold=int(os.getenv("UPLOAD_MULTIPART_THRESHOLD", str(8 * mib))),
+        multipart_chunksize=int(os.getenv("UPLOAD_MULTIPART_CHUNKSIZE", str(8 * mib))),
+        max_concurrency=part_concurrency,
+    )
+    # Not a constructor argument of boto3's TransferConfig, but honoured by
+    # the underlying s3transfer manager.
+    config.max_in_memory_upload_chunks = part_concurrency
+    return config
+
+
+def upload_files(client, bucket: str, uploads: Sequence[Upload], workers: Optional[int] = None) -> List[UploadResult]:
+    """
+    Upload several file objects concurrently.
+
+    At most `workers` files (default `UPLOAD_CONCURRENCY`) are in flight at
+    once. Each file is streamed from its file object in bounded parts (see
+    `get_transfer_config`) and hashed on the way, so no file is ever held
+    in memory as a whole.
+
+    Returns:
+        One `UploadResult` per upload, in input order.
+    """
+    ensure_bucket(client, bucket)
+    workers = workers or max(1, int(os.getenv("UPLOAD_CONCURRENCY", "8")))
+    config = get_transfer_config()
+
+    def put(upload: Upload) -> UploadResult:
+        key, fileobj, content_type = upload
+        reader = HashingReader(fileobj)
+        try:
+            client.upload_fileobj(reader, bucket, key, ExtraArgs={"ContentType": content_type}, Config=config)
+        except Exception as exc:
+            return UploadResult(None, reader.size, exc)
+        return UploadResult(reader.hexdigest(), reader.size, None)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as executor:
+        return list(executor.map(put, uploads))
+
+
+def delete_keys(client, bucket: str, keys: Sequence[str]) -> None:
+    """Best-effort removal of `keys`, in batches of 1000 (the S3 limit)."""
+    for start in range(0, len(keys), 1000):
+        batch = keys[start : start + 1000]
+        try:
+            client.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True})
+        except Exception:
+            pass
+
+
+def get_prefetch_window() -> int:
+    """Return the number of objects fetched ahead during exports."""
+    return max(1, int(os.getenv("EXPORT_PREFETCH_WINDOW", "8")))
+
+
+def prefetch(
+    fetch: Callable[[T], R],
+    items: Iterable[T],
+    window: Optional[int] = None,
+) -> Iterator[Tuple[T, R]]:
+    """
+    Apply `fetch` to `items` on a thread pool, yielding results in input order.
+
+    At most `window` calls are in flight or completed-but-unconsumed at any
+    time, so memory is bounded by `window` results regardless of how many
+    items there are. `items` is consumed lazily. Exceptions raised by
+    `fetch` propagate to the consumer when the corresponding result is
+    reached; callers that want to skip failures should catch them inside
+    `fetch`.
+
+    Args:
+        fetch: Function called once per item, typically doing network I/O.
+        items: Iterable of inputs; read only as the window advances.
+        window: Maximum number of outstanding fetches. Defaults to
+            `EXPORT_PREFETCH_WINDOW`.
+
+    Yields:
+        `(item, result)` pairs in the same order as `items`.
+    """
+    window = window or get_prefetch_window()
+    source = iter(items)
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix="prefetch")
+    try:
+        for item in source:
+            pending.append((item, executor.submit(fetch, item)))
+            if len(pending) >= window:
+                break
+        while pending:
+            item, future = pending.popleft()
+            result = future.result()
+            # Refill the window before handing the result to the consumer so
+            # the next downloads overlap with whatever the consumer does.
+            for next_item in source:
+                pending.append((next_item, executor.submit(fetch, next_item)))
+                break
+            yield item, result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,100 @@
+"""
+Helpers for the materialized blurred-variant store.
+
+A blurred variant is valid for as long as the set of faces that must be
+blurred (those without approved consent) does not change. That set is
+summarised by a fingerprint which is stored next to the variant when it
+is built and compared against the current faces when it is used.
+"""
+import hashlib
+import json
+import os
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def get_redaction_mode() -> str:
+    """Return the redaction mode used to build blurred variants (`REDACTION_MODE`)."""
+    return os.getenv("REDACTION_MODE", "gaussian").lower()
+
+
+def get_variant_mode(variant: Optional[models.BlurredVariant]) -> str:
+    """Return the redaction mode of a variant: the one chosen for its photo, else `REDACTION_MODE`."""
+    return (variant.mode if variant is not None else None) or get_redaction_mode()
+
+
+def blur_key(s3_key: str, fingerprint: str) -> str:
+    """
+    Return the S3 key of the blurred copy of `s3_key` built for `fingerprint`.
+
+    Each fingerprint gets an object of its own, so a variant row never
+    points at an object that a concurrent task rewrote with other faces.
+    """
+    return f"{s3_key.rsplit('.', 1)[0]}_blur_{fingerprint[:12]}.jpg"
+
+
+def boxes_to_blur(faces: Iterable[models.Face]) -> list:
+    """Return the bounding boxes of faces lacking approved consent."""
+    return [face.bbox for face in faces if face.consent_status != models.ConsentStatus.APPROVED]
+
+
+def consent_fingerprint(faces: Iterable[models.Face], mode: Optional[str] = None) -> str:
+    """
+    Return a stable digest of the faces that a blurred variant must hide.
+
+    Only non-approved faces contribute, so changes that do not alter the
+    blurred output (e.g. renaming a face) keep the fingerprint unchanged.
+    The redaction mode is included so that switching `REDACTION_MODE`, or
+    the mode chosen for a photo, invalidates existing variants.
+    """
+    return boxes_fingerprint(
+        ((face.id, face.bbox) for face in faces if face.consent_status != models.ConsentStatus.APPROVED), mode
+    )
+
+
+def boxes_fingerprint(boxes: Iterable[Tuple[int, dict]], mode: Optional[str] = None) -> str:
+    """Same as `consent_fingerprint`, from the `(face_id, bbox)` pairs of the non-approved faces."""
+    entries = sorted((face_id, json.dumps(bbox, sort_keys=True)) for face_id, bbox in boxes)
+    payload = {"mode": mode or get_redaction_mode(), "faces": entries}
+    return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()
+
+
+def get_or_create_variant(db: Session, photo_id: int) -> models.BlurredVariant:
+    """Return the variant row for a photo, adding an empty stale one if missing."""
+    variant = db.query(models.BlurredVariant).filter(models.BlurredVariant.photo_id == photo_id).first()
+    if not variant:
+        variant = models.BlurredVariant(photo_id=photo_id, is_stale=True)
+        db.add(variant)
+    return variant
+
+
+def mark_stale(db: Session, photo_id: int) -> None:
+    """Flag the blurred variant of a photo as outdated. The caller commits."""
+    get_or_create_variant(db, photo_id).is_stale = True
+
+
+def mark_photo_stale(photo: models.Photo) -> None:
+    """Like `mark_stale`, for a photo whose `blurred_variant` is already loaded."""
+    if photo.blurred_variant is None:
+        photo.blurred_variant = models.BlurredVariant(is_stale=True)
+    else:
+        photo.blurred_variant.is_stale = True
+
+
+def is_current(
+    variant: Optional[models.BlurredVariant], faces: Iterable[models.Face], mode: Optional[str] = None
+) -> bool:
+    """
+    Return True if `variant` exists, is built and matches the given faces and mode.
+
+    `mode` defaults to the mode of the variant (see `get_variant_mode`).
+    """
+    return (
+        variant is not None
+        and not variant.is_stale
+        and variant.s3_key is not None
+        and variant.consent_fingerprint == consent_fingerprint(faces, mode or get_variant_mode(variant))
+    )
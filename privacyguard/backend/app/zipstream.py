@@ -0,0 +1,74 @@
+"""
+Streaming ZIP writer used by the export endpoints.
+
+The standard library `zipfile` module can write archives to non-seekable
+streams: each entry gets a local header with the "data descriptor" flag set
+and the CRC/sizes are emitted after the data. This module wraps that
+behaviour in a generator so that an archive can be handed to
+`StreamingResponse` chunk by chunk. Only the bytes produced since the last
+yield are ever held in memory, so the footprint is bounded by one input
+chunk plus the central directory.
+"""
+import io
+import time
+import zipfile
+from typing import Iterable, Iterator, Tuple
+
+
+# An archive entry: the name inside the ZIP and an iterable of byte chunks.
+ZipEntry = Tuple[str, Iterable[bytes]]
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable buffer that is emptied after every drain."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[ZipEntry], compression: int = zipfile.ZIP_STORED) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive built from `entries` as a sequence of byte chunks.
+
+    Entries are consumed lazily, so the caller can fetch each member only
+    when the writer reaches it. JPEG data does not compress, hence the
+    default of `ZIP_STORED`; pass `ZIP_DEFLATED` for other content.
+
+    Args:
+        entries: Iterable of `(arcname, chunks)` pairs.
+        compression: zipfile compression constant applied to every entry.
+
+    Yields:
+        Consecutive pieces of the archive.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression) as zf:
+        for arcname, chunks in entries:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+            info.compress_type = compression
+            with zf.open(info, "w") as dest:
+                for chunk in chunks:
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Closing the archive writes the central directory.
+    data = sink.drain()
+    if data:
+        yield data
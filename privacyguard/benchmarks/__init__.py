@@ -0,0 +1 @@
+"""Performance benchmarks for PrivacyGuard. Run modules with `python -m benchmarks.<name>`."""
@@ -0,0 +1,87 @@
+"""
+Load benchmark for the HTTP API.
+
+Opens `--clients` concurrent connections and has each of them issue
+requests back to back for `--duration` seconds, then reports requests per
+second and latency percentiles. Run it once against a server started with
+`API_ASYNC_ROUTES=false` and once with `API_ASYNC_ROUTES=true` to compare
+the sync and asyncio-native handlers. Requires `httpx`. Usage:
+
+    python -m benchmarks.bench_api_load --url http://localhost:8000/photos \\
+        --token "$TOKEN" --clients 200 --duration 30
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, q: float) -> float:
+    """Return the q-th percentile (0-100) of `values` by nearest rank."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run(url: str, token: str, clients: int, duration: float, method: str, upload: str):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    payload = open(upload, "rb").read() if upload else None
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=60) as client:
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    if method == "POST":
+                        response = await client.post(url, files={"file": ("selfie.jpg", payload, "image/jpeg")})
+                    else:
+                        response = await client.get(url)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--token", default="")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--method", choices=["GET", "POST"], default="GET")
+    parser.add_argument("--upload", help="file sent as `file` for POST endpoints such as /client/search")
+    args = parser.parse_args()
+    latencies, errors, elapsed = asyncio.run(
+        run(args.url, args.token, args.clients, args.duration, args.method, args.upload)
+    )
+    print(f"{args.method} {args.url} with {args.clients} clients for {elapsed:.1f}s")
+    print(f"requests/s: {len(latencies) / elapsed:.1f} ({len(latencies)} ok, {errors} errors)")
+    if latencies:
+        print(
+            "latency ms: "
+            f"mean {statistics.mean(latencies) * 1000:.1f}  "
+            f"p50 {percentile(latencies, 50) * 1000:.1f}  "
+            f"p95 {percentile(latencies, 95) * 1000:.1f}  "
+            f"p99 {percentile(latencies, 99) * 1000:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
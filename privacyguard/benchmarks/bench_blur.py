@@ -0,0 +1,93 @@
+"""
+Throughput benchmark for face blurring.
+
+Compares the single-threaded `worker.tasks.blur_faces_in_image` with the
+process-pool `BlurEngine` on synthetic photos: a batch of `--images`
+photos with `--faces` faces each, and a single photo with one face (the
+shape of a `generate_blur` call, which the engine keeps in process).
+Usage:
+
+    python -m benchmarks.bench_blur --images 16 --size 4000x3000 --faces 8 --workers 4 --mode gaussian
+"""
+import argparse
+import random
+import time
+
+from PIL import Image
+
+from worker.blur_engine import BlurEngine
+from worker.redaction import GAUSSIAN, MODES
+from worker.tasks import blur_faces_in_image
+
+
+def make_jobs(count: int, width: int, height: int, faces: int, seed: int = 0):
+    """Return `count` noisy images, each with `faces` random boxes."""
+    rng = random.Random(seed)
+    jobs = []
+    for _ in range(count):
+        image = Image.effect_noise((width, height), 64).convert("RGB")
+        boxes = []
+        for _ in range(faces):
+            size = rng.uniform(0.05, 0.15)
+            boxes.append(
+                {
+                    "left": rng.uniform(0, 1 - size),
+                    "top": rng.uniform(0, 1 - size),
+                    "width": size,
+                    "height": size,
+                }
+            )
+        jobs.append((image, boxes))
+    return jobs
+
+
+def _time(function, jobs, repeat: int = 1) -> float:
+    """Return the mean duration of `function(jobs)` over `repeat` runs after a warm-up run."""
+    function(jobs)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(jobs)
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--size", default="4000x3000")
+    parser.add_argument("--faces", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--mode", choices=MODES, default=GAUSSIAN)
+    parser.add_argument("--repeat", type=int, default=5, help="runs averaged for the single photo")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split("x"))
+    jobs = make_jobs(args.images, width, height, args.faces)
+    single = make_jobs(1, width, height, 1, seed=1)
+
+    def baseline(jobs):
+        for image, boxes in jobs:
+            blur_faces_in_image(image, boxes, args.mode)
+
+    engine = BlurEngine(workers=args.workers, min_pixels=0)
+    try:
+        cases = [
+            (f"{args.images} images, {args.faces} faces each", jobs, 1),
+            ("1 image, 1 face", single, args.repeat),
+        ]
+        results = []
+        for label, case_jobs, repeat in cases:
+            reference = _time(baseline, case_jobs, repeat)
+            pooled = _time(lambda jobs: engine.blur_many(jobs, args.mode), case_jobs, repeat)
+            results.append((label, len(case_jobs), reference, pooled))
+    finally:
+        engine.shutdown()
+
+    print(f"{width}x{height}, mode {args.mode}, {engine.workers} workers")
+    for label, count, reference, pooled in results:
+        print(f"{label}:")
+        print(f"  blur_faces_in_image: {reference:.3f}s ({count / reference:.2f} images/s)")
+        print(f"  BlurEngine:          {pooled:.3f}s ({count / pooled:.2f} images/s)")
+        print(f"  speed-up:            {reference / pooled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
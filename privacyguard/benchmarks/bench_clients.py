@@ -0,0 +1,50 @@
+"""
+Microbenchmark for boto3 client reuse.
+
+Measures the per-request cost of building a new S3 client (what every
+helper used to do) against fetching the shared client from
+`backend.app.aws`, each followed by signing a download URL. No network
+access is needed. Usage:
+
+    python -m benchmarks.bench_clients --requests 200
+"""
+import argparse
+import os
+import time
+
+import boto3
+
+from backend.app import aws
+
+
+def presign(client) -> str:
+    return client.generate_presigned_url(
+        "get_object", Params={"Bucket": "photos", "Key": "example.jpg"}, ExpiresIn=3600
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        presign(boto3.client("s3", region_name="us-east-1", config=aws.client_config("s3")))
+    fresh = (time.perf_counter() - start) / args.requests
+
+    aws.get_s3_client()  # build once, as the first request would
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        presign(aws.get_s3_client())
+    shared = (time.perf_counter() - start) / args.requests
+
+    print(f"new client per request: {fresh * 1000:.3f} ms/request")
+    print(f"shared client:          {shared * 1000:.3f} ms/request")
+    print(f"saved per request:      {(fresh - shared) * 1000:.3f} ms ({fresh / shared:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Detection proxy benchmark: latency and payload size against accuracy.
+
+For each proxy long edge, builds the detection proxy of every input image
+and reports the time to build it and the payload sent to DetectFaces. With
+`--detect`, it also runs DetectFaces on the original and on the proxy and
+reports the detection round trip and how well the proxy boxes match the
+original ones: recall of faces (a proxy box with IoU >= 0.5 against an
+original box) and mean IoU of the matches.
+
+Inputs are the JPEGs of `--images` or, by default, synthetic photos (see
+`bench_e2e.make_jpeg`). Accuracy is only meaningful against the real
+service (`FACE_SERVICE_BACKEND=rekognition` with AWS credentials); the
+fake backend derives boxes from the image bytes. Originals above the 5 MB
+inline limit are counted as failed detections, as the service rejects
+them. Usage:
+
+    python -m benchmarks.bench_detection_proxy --images ./event --long-edges 0 1024 1920 --detect
+"""
+import argparse
+import glob
+import os
+import random
+import statistics
+import time
+
+from benchmarks.bench_api_load import percentile
+from benchmarks.bench_e2e import make_jpeg
+
+
+def iou(a: dict, b: dict) -> float:
+    """Return the intersection over union of two relative boxes."""
+    left = max(a["Left"], b["Left"])
+    top = max(a["Top"], b["Top"])
+    right = min(a["Left"] + a["Width"], b["Left"] + b["Width"])
+    bottom = min(a["Top"] + a["Height"], b["Top"] + b["Height"])
+    inter = max(0.0, right - left) * max(0.0, bottom - top)
+    union = a["Width"] * a["Height"] + b["Width"] * b["Height"] - inter
+    return inter / union if union else 0.0
+
+
+def detect(client, data: bytes):
+    """Return the bounding boxes found in `data` and the call latency, or (None, 0) on error."""
+    start = time.perf_counter()
+    try:
+        response = client.detect_faces(Image={"Bytes": data}, Attributes=["DEFAULT"])
+    except Exception:
+        return None, 0.0
+    return [face["BoundingBox"] for face in response["FaceDetails"]], time.perf_counter() - start
+
+
+def load_images(args) -> list:
+    if args.images:
+        paths = sorted(glob.glob(os.path.join(args.images, "*.jp*g")))[: args.count]
+        images = []
+        for path in paths:
+            with open(path, "rb") as fh:
+                images.append(fh.read())
+        return images
+    rng = random.Random(0)
+    width, height = (int(v) for v in args.size.split("x"))
+    return [make_jpeg(width, height, faces=rng.randint(0, 4), rng=rng, quality=95) for _ in range(args.count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="directory of JPEGs (default: synthetic photos)")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--size", default="6000x4000", help="size of the synthetic photos")
+    parser.add_argument("--long-edges", type=int, nargs="+", default=[0, 1024, 1920, 2560])
+    parser.add_argument("--detect", action="store_true", help="call DetectFaces (see FACE_SERVICE_BACKEND)")
+    args = parser.parse_args()
+
+    from worker import detection_proxy
+
+    images = load_images(args)
+    print(f"{len(images)} images, mean {statistics.mean(len(d) for d in images) / 2**20:.2f} MiB")
+
+    client = reference = None
+    if args.detect:
+        from backend.app.aws import get_rekognition_client
+
+        client = get_rekognition_client()
+        reference = [
+            detect(client, data)[0] if len(data) <= detection_proxy.MAX_IMAGE_BYTES else None for data in images
+        ]
+
+    header = f"{'long edge':>10} {'build p50':>10} {'build p99':>10} {'payload':>10}"
+    if args.detect:
+        header += f" {'detect p50':>11} {'failed':>7} {'recall':>7} {'mean IoU':>9}"
+    print(header)
+    for long_edge in args.long_edges:
+        builds, sizes, proxies = [], [], []
+        for data in images:
+            start = time.perf_counter()
+            proxy = detection_proxy.make_proxy(data, long_edge) if long_edge else data
+            builds.append(time.perf_counter() - start)
+            sizes.append(len(proxy))
+            proxies.append(proxy)
+        line = (
+            f"{long_edge or 'original':>10} {percentile(builds, 50) * 1000:>8.1f}ms "
+            f"{percentile(builds, 99) * 1000:>8.1f}ms {statistics.mean(sizes) / 1024:>7.0f}KiB"
+        )
+        if args.detect:
+            latencies, failed, matched, total, ious = [], 0, 0, 0, []
+            for proxy, original_boxes in zip(proxies, reference):
+                boxes, latency = detect(client, proxy) if len(proxy) <= detection_proxy.MAX_IMAGE_BYTES else (None, 0)
+                if boxes is None:
+                    failed += 1
+                    continue
+                latencies.append(latency)
+                for original in original_boxes or []:
+                    total += 1
+                    best = max((iou(original, box) for box in boxes), default=0.0)
+                    if best >= 0.5:
+                        matched += 1
+                        ious.append(best)
+            recall = matched / total if total else float("nan")
+            mean_iou = statistics.mean(ious) if ious else float("nan")
+            line += f" {percentile(latencies, 50) * 1000:>9.1f}ms {failed:>7} {recall:>7.2f} {mean_iou:>9.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
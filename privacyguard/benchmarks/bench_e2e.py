@@ -0,0 +1,233 @@
+"""
+End-to-end ingest benchmark.
+
+Generates synthetic JPEGs of several sizes and drives them through the
+whole pipeline in one process, against the local stand-ins of
+`benchmarks.local_stack` (SQLite, in-memory S3, fake Rekognition, recorded
+Celery tasks):
+
+    POST /upload -> process_photo -> generate_blur -> GET /export/*
+
+Each stage is run to completion before the next one starts so that it can
+be measured on its own. The report gives, per stage, latency percentiles
+per call, throughput in photos per minute and the number of SQL statements
+and S3 requests issued, plus the peak RSS of the process. Usage:
+
+    python -m benchmarks.bench_e2e --photos 200 --sizes 1024x768 4000x3000
+    python -m benchmarks.bench_e2e --save-baseline baseline.json
+    python -m benchmarks.bench_e2e --compare baseline.json
+
+`--compare` prints the relative change of every figure against a baseline
+saved by an earlier run (e.g. on the previous version of the code).
+Rekognition latency and throttling are taken from the `FAKE_REKOGNITION_*`
+variables (see `backend.app.fake_rekognition`); detection batching from
+`PROCESS_BATCH_SIZE` (1 runs `process_photo` once per photo).
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from PIL import Image, ImageDraw
+
+from benchmarks.bench_api_load import percentile
+from benchmarks import local_stack
+
+
+def make_jpeg(width: int, height: int, faces: int, rng: random.Random, quality: int = 90) -> bytes:
+    """Return a photo-like JPEG: noisy random scene with face-sized ellipses."""
+    base = Image.linear_gradient("L").rotate(rng.uniform(0, 360)).resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(base)
+    # Large random shapes make every scene distinct, so that near-duplicate
+    # detection does not kick in between unrelated benchmark photos.
+    for _ in range(12):
+        x, y = rng.randint(0, width), rng.randint(0, height)
+        w, h = rng.randint(width // 8, width // 2), rng.randint(height // 8, height // 2)
+        draw.rectangle((x - w // 2, y - h // 2, x + w // 2, y + h // 2), fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    noise = Image.effect_noise((width, height), 40).convert("RGB")
+    image = Image.blend(base, noise, 0.3)
+    draw = ImageDraw.Draw(image)
+    for _ in range(faces):
+        size = rng.randint(max(8, width // 20), max(9, width // 6))
+        left = rng.randint(0, max(0, width - size))
+        top = rng.randint(0, max(0, height - size))
+        color = tuple(rng.randint(120, 230) for _ in range(3))
+        draw.ellipse((left, top, left + size, top + int(size * 1.3)), fill=color)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class Recorder:
+    """Collects per-call latencies, SQL statement and S3 request counts per stage."""
+
+    def __init__(self, engine, s3) -> None:
+        from sqlalchemy import event
+
+        self.s3 = s3
+        self.stage = None
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(int)
+        self.s3_requests = defaultdict(int)
+        self.photos = defaultdict(int)
+        self.elapsed = defaultdict(float)
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        if self.stage:
+            self.queries[self.stage] += 1
+
+    def run(self, stage: str, calls, photos_per_call=1) -> None:
+        """Run each zero-argument callable in `calls`, timing it under `stage`."""
+        self.stage = stage
+        s3_before = self.s3.requests
+        started = time.perf_counter()
+        for index, call in enumerate(calls):
+            start = time.perf_counter()
+            call()
+            self.latencies[stage].append(time.perf_counter() - start)
+            self.photos[stage] += photos_per_call[index] if isinstance(photos_per_call, list) else photos_per_call
+        self.elapsed[stage] += time.perf_counter() - started
+        self.s3_requests[stage] += self.s3.requests - s3_before
+        self.stage = None
+
+    def report(self) -> dict:
+        stages = {}
+        for stage, latencies in self.latencies.items():
+            elapsed = self.elapsed[stage]
+            stages[stage] = {
+                "calls": len(latencies),
+                "photos": self.photos[stage],
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p90_ms": percentile(latencies, 90) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "max_ms": max(latencies) * 1000,
+                "photos_per_min": self.photos[stage] / elapsed * 60 if elapsed else 0.0,
+                "queries": self.queries[stage],
+                "queries_per_photo": self.queries[stage] / max(1, self.photos[stage]),
+                "s3_requests": self.s3_requests[stage],
+            }
+        return stages
+
+
+def run(args) -> dict:
+    tmp = tempfile.mkdtemp(prefix="bench_e2e_")
+    local_stack.configure(os.path.join(tmp, "bench.db"))
+    from fastapi.testclient import TestClient
+
+    from backend.app import database, main
+    from worker import tasks
+
+    s3 = local_stack.FakeS3()
+    queue = local_stack.TaskQueue()
+    local_stack.install(s3, queue)
+    recorder = Recorder(database.engine, s3)
+    rng = random.Random(args.seed)
+
+    sizes = [tuple(int(v) for v in size.split("x")) for size in args.sizes]
+    images = [
+        make_jpeg(*sizes[i % len(sizes)], faces=rng.randint(0, args.max_faces), rng=rng) for i in range(args.photos)
+    ]
+
+    with TestClient(main.app) as client:
+        token = client.post("/login", data={"username": "admin", "password": "admin"}).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        batches = [images[i : i + args.batch] for i in range(0, len(images), args.batch)]
+
+        def upload(batch):
+            files = [("files", (f"IMG_{rng.getrandbits(32):08x}.jpg", data, "image/jpeg")) for data in batch]
+            response = client.post("/upload", files=files)
+            response.raise_for_status()
+
+        recorder.run("upload", [lambda b=b: upload(b) for b in batches], [len(b) for b in batches])
+
+        def drain(stage: str, *task_names: str) -> None:
+            calls, photos = [], []
+            for task_name in task_names:
+                task = getattr(tasks, task_name.rsplit(".", 1)[1])
+                for _, a, k in queue.drain(task_name):
+                    calls.append(lambda task=task, a=a, k=k: task.run(*a, **k))
+                    # Batch tasks take a list of photo ids.
+                    photos.append(len(a[0]) if isinstance(a[0], list) else 1)
+            recorder.run(stage, calls, photos)
+
+        drain("process_photo", "worker.tasks.process_photo", "worker.tasks.process_photos_batch")
+        drain("generate_blur", "worker.tasks.generate_blur")
+
+        def export(path: str) -> None:
+            client.get(path).raise_for_status()
+
+        recorder.run("export_privacy_safe", [lambda: export("/export/privacy-safe")], args.photos)
+        recorder.run("export_approved", [lambda: export("/export/approved")], args.photos)
+
+    return {
+        "config": {
+            "photos": args.photos,
+            "sizes": args.sizes,
+            "batch": args.batch,
+            "seed": args.seed,
+            "input_mib": sum(len(data) for data in images) / 2**20,
+            "fake_rekognition_latency": os.getenv("FAKE_REKOGNITION_LATENCY", "fixed:0"),
+            "fake_rekognition_throttle_rate": os.getenv("FAKE_REKOGNITION_THROTTLE_RATE", "0"),
+        },
+        "stages": recorder.report(),
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def print_report(result: dict, baseline: dict = None) -> None:
+    columns = ["p50_ms", "p90_ms", "p99_ms", "photos_per_min", "queries_per_photo", "s3_requests"]
+
+    def cell(stage: str, column: str) -> str:
+        value = result["stages"][stage][column]
+        text = f"{value:.1f}"
+        old = (baseline or {}).get("stages", {}).get(stage, {}).get(column)
+        if old:
+            text += f" ({(value - old) / old * 100:+.0f}%)"
+        return text
+
+    config = result["config"]
+    print(f"{config['photos']} photos, {config['input_mib']:.1f} MiB, sizes {' '.join(config['sizes'])}")
+    print(f"{'stage':<20}" + "".join(f"{column:>22}" for column in columns))
+    for stage in result["stages"]:
+        print(f"{stage:<20}" + "".join(f"{cell(stage, column):>22}" for column in columns))
+    rss = f"peak RSS: {result['peak_rss_mib']:.1f} MiB"
+    if baseline:
+        old = baseline["peak_rss_mib"]
+        rss += f" ({(result['peak_rss_mib'] - old) / old * 100:+.0f}%)"
+    print(rss)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=100)
+    parser.add_argument("--sizes", nargs="+", default=["1024x768", "2048x1536", "4000x3000"])
+    parser.add_argument("--max-faces", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=20, help="files per /upload request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+    result = run(args)
+    print_report(result, baseline)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"baseline saved to {args.save_baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
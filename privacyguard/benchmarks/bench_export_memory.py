@@ -0,0 +1,112 @@
+"""
+Peak memory of export planning against archive size.
+
+Fills a throwaway SQLite database with N photos (half of them with a
+pending face) and plans both exports twice, each run in a fresh process so
+that peak RSS is measured in isolation:
+
+* `orm-all`: the former approach, loading every Photo and its faces with
+  `.all()` and classifying them in Python;
+* `stream`: `exports.iter_approved` / `exports.iter_to_blur`, which read
+  plain rows through `database.stream`.
+
+The reported figure is the peak RSS growth over the process baseline
+(imports and an open connection). Usage:
+
+    python -m benchmarks.bench_export_memory --rows 10000 50000 100000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, selectinload
+
+from backend.app import database, exports, models, variants
+
+
+def peak_rss_kib() -> int:
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def populate(path: str, rows: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(engine)
+    pending = models.ConsentSummary.PENDING
+    no_faces = models.ConsentSummary.NO_FACES
+    with engine.begin() as conn:
+        conn.execute(
+            insert(models.Photo),
+            [
+                dict(
+                    id=i,
+                    filename=f"IMG_{i:06d}.jpg",
+                    s3_key=f"{i:032x}.jpg",
+                    face_count=i % 2,
+                    pending_count=i % 2,
+                    consent_summary=pending if i % 2 else no_faces,
+                )
+                for i in range(1, rows + 1)
+            ],
+        )
+        conn.execute(
+            insert(models.Face),
+            [
+                dict(photo_id=i, bbox={"left": 0.1, "top": 0.1, "width": 0.2, "height": 0.2})
+                for i in range(1, rows + 1, 2)
+            ],
+        )
+
+
+def plan(path: str, mode: str) -> None:
+    """Child process: plan both exports and print `rows peak_kib seconds`."""
+    engine = create_engine(f"sqlite:///{path}")
+    with Session(engine) as db:
+        db.execute(models.Photo.__table__.select().limit(1)).all()
+        baseline = peak_rss_kib()
+        start = time.perf_counter()
+        if mode == "orm-all":
+            photos = db.query(models.Photo).options(selectinload(models.Photo.faces)).order_by(models.Photo.id).all()
+            approved = [p for p in photos if not variants.boxes_to_blur(p.faces)]
+            to_blur = [p for p in photos if variants.boxes_to_blur(p.faces)]
+            count = len(approved) + len(to_blur)
+        else:
+            count = sum(1 for _ in exports.iter_approved(db)) + sum(1 for _ in exports.iter_to_blur(db))
+        elapsed = time.perf_counter() - start
+    print(count, peak_rss_kib() - baseline, f"{elapsed:.3f}")
+
+
+def main() -> None:
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        plan(sys.argv[2], sys.argv[3])
+        return
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--batch-size", type=int, default=database.get_stream_batch_size())
+    args = parser.parse_args()
+    env = dict(os.environ, DB_STREAM_BATCH_SIZE=str(args.batch_size))
+
+    print(f"{'rows':>8} {'mode':>8} {'peak RSS growth':>16} {'time':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"bench_{rows}.db")
+            populate(path, rows)
+            for mode in ("orm-all", "stream"):
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_export_memory", "--child", path, mode],
+                    env=env,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout.split()
+                _, peak_kib, seconds = out
+                print(f"{rows:>8} {mode:>8} {int(peak_kib) / 1024:>13.1f} MiB {float(seconds):>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Local stand-ins for the services the pipeline depends on.
+
+Used by the end-to-end benchmarks to run the API and the worker tasks in
+one process without network access:
+
+* PostgreSQL is replaced by a SQLite file (`DATABASE_URL`);
+* S3 by `FakeS3`, an in-memory object store installed as the shared S3
+  client;
+* Rekognition by `backend.app.fake_rekognition` (`FACE_SERVICE_BACKEND`);
+* RabbitMQ by `TaskQueue`, which records enqueued tasks so the caller can
+  run (and time) them one stage at a time.
+
+`configure()` must run before anything from `backend.app` is imported,
+because the database engine is created at import time.
+"""
+import io
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+
+def configure(db_path: str, **env: str) -> None:
+    """Point the application at local stand-ins via environment variables."""
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{db_path}",
+        FACE_SERVICE_BACKEND="fake",
+        API_ASYNC_ROUTES="false",
+        AWS_ACCESS_KEY_ID="benchmark",
+        AWS_SECRET_ACCESS_KEY="benchmark",
+    )
+    os.environ.update(env)
+
+
+class _ClientError(Exception):
+    pass
+
+
+class FakeS3:
+    """Thread-safe in-memory subset of the boto3 S3 client used by the app."""
+
+    class exceptions:
+        BucketAlreadyOwnedByYou = _ClientError
+        BucketAlreadyExists = _ClientError
+
+    def __init__(self) -> None:
+        self.objects: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def _count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def head_bucket(self, Bucket: str) -> dict:
+        self._count()
+        return {}
+
+    def create_bucket(self, Bucket: str) -> dict:
+        self._count()
+        return {}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, ContentType: Optional[str] = None, **kwargs) -> dict:
+        self._count()
+        with self._lock:
+            self.objects[Key] = bytes(Body)
+        return {}
+
+    def upload_fileobj(self, Fileobj, Bucket: str, Key: str, ExtraArgs=None, Config=None) -> None:
+        data = io.BytesIO()
+        chunk_size = getattr(Config, "multipart_chunksize", 8 * 1024 * 1024)
+        while True:
+            chunk = Fileobj.read(chunk_size)
+            if not chunk:
+                break
+            data.write(chunk)
+        self.put_object(Bucket=Bucket, Key=Key, Body=data.getvalue())
+
+    def get_object(self, Bucket: str, Key: str, **kwargs) -> dict:
+        self._count()
+        with self._lock:
+            data = self.objects.get(Key)
+        if data is None:
+            raise KeyError(Key)
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        self._count()
+        with self._lock:
+            if Key not in self.objects:
+                raise KeyError(Key)
+            return {"ContentLength": len(self.objects[Key])}
+
+    def delete_objects(self, Bucket: str, Delete: dict) -> dict:
+        self._count()
+        with self._lock:
+            for item in Delete["Objects"]:
+                self.objects.pop(item["Key"], None)
+        return {}
+
+    def generate_presigned_url(self, operation: str, Params: dict, ExpiresIn: int = 3600) -> str:
+        return f"http://s3.local/{Params['Bucket']}/{Params['Key']}"
+
+
+class TaskQueue:
+    """Records tasks sent to the broker instead of delivering them."""
+
+    def __init__(self) -> None:
+        self.pending = deque()
+
+    def send_task(self, name: str, args=None, kwargs=None, **options) -> None:
+        self.pending.append((name, list(args or []), dict(kwargs or {})))
+
+    def delay_for(self, name: str):
+        """Return a replacement for `task.delay` that records the call."""
+
+        def delay(*args, **kwargs):
+            self.pending.append((name, list(args), kwargs))
+
+        return delay
+
+    def drain(self, name: str) -> list:
+        """Remove and return the queued calls of task `name`, in order."""
+        taken = [task for task in self.pending if task[0] == name]
+        self.pending = deque(task for task in self.pending if task[0] != name)
+        return taken
+
+
+def install(s3: FakeS3, queue: TaskQueue) -> None:
+    """Wire the stand-ins into the application modules."""
+    from backend.app import aws, celery_app
+    from worker import tasks
+
+    aws._clients["s3"] = s3
+    celery_app.celery_app.send_task = queue.send_task
+    for name in ("process_photo", "process_photos_batch", "generate_blur", "index_face"):
+        getattr(tasks, name).delay = queue.delay_for(f"worker.tasks.{name}")
@@ -17,14 +17,23 @@ import { Link } from 'react-router-dom';
 const DashboardPage = ({ token }) => {
   const [loading, setLoading] = useState(true);
   const [photos, setPhotos] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  // Fetch one page of photos; the API returns the next page cursor in a header
+  const fetchPage = async (cursor) => {
+    const response = await axios.get('/photos', {
+      headers: { Authorization: `Bearer ${token}` },
+      params: cursor ? { cursor } : {},
+    });
+    setNextCursor(response.headers['x-next-cursor'] || null);
+    return response.data;
+  };
 
   useEffect(() => {
     const fetchPhotos = async () => {
       try {
-        const response = await axios.get('/photos', {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        setPhotos(response.data);
+        setPhotos(await fetchPage(null));
       } catch (err) {
         console.error(err);
       } finally {
@@ -34,6 +43,18 @@ const DashboardPage = ({ token }) => {
     fetchPhotos();
   }, [token]);
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(nextCursor);
+      setPhotos((current) => current.concat(page));
+    } catch (err) {
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) {
     return (
       <Box sx={{ display: 'flex', justifyContent: 'center', mt: 4 }}>
@@ -106,6 +127,13 @@ const DashboardPage = ({ token }) => {
           ))}
         </TableBody>
       </Table>
+      {nextCursor && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+          <Button variant="outlined" onClick={handleLoadMore} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </Button>
+        </Box>
+      )}
     </Box>
   );
 };
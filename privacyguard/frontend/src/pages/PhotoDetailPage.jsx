@@ -27,7 +27,7 @@ const PhotoDetailPage = ({ token }) => {
   const { id } = useParams();
   const photoId = parseInt(id, 10);
   const [photo, setPhoto] = useState(null);
-  const [originalUrl, setOriginalUrl] = useState('');
+  const [imageUrl, setImageUrl] = useState('');
   const [blurredUrl, setBlurredUrl] = useState('');
   const [error, setError] = useState(null);
   const imageRef = useRef(null);
@@ -45,12 +45,23 @@ const PhotoDetailPage = ({ token }) => {
         setError(err.response?.data?.detail || 'Failed to load photo');
       }
     };
+    // Show the reduced-size preview; fall back to the original while the
+    // worker has not rendered it yet.
     const fetchUrl = async () => {
+      const headers = { Authorization: `Bearer ${token}` };
       try {
-        const res = await axios.get(`/photos/${photoId}/url`, {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        setOriginalUrl(res.data.url);
+        const res = await axios.get(`/photos/${photoId}/preview_url`, { headers });
+        setImageUrl(res.data.url);
+        return;
+      } catch (err) {
+        if (err.response?.status !== 404 || err.response?.data?.detail === 'Photo not found') {
+          setError(err.response?.data?.detail || 'Failed to load image');
+          return;
+        }
+      }
+      try {
+        const res = await axios.get(`/photos/${photoId}/url`, { headers });
+        setImageUrl(res.data.url);
       } catch (err) {
         setError(err.response?.data?.detail || 'Failed to load image');
       }
@@ -92,7 +103,19 @@ const PhotoDetailPage = ({ token }) => {
     } else {
       imgEl.onload = handleLoad;
     }
-  }, [photo]);
+  }, [photo, imageUrl]);
+
+  // Open the full-resolution original in a new tab
+  const handleOpenOriginal = async () => {
+    try {
+      const res = await axios.get(`/photos/${photoId}/url`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      window.open(res.data.url, '_blank', 'noopener');
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Failed to load image');
+    }
+  };
 
   // Handle updates to face name
   const handleNameUpdate = async (faceId, newName) => {
@@ -183,10 +206,10 @@ const PhotoDetailPage = ({ token }) => {
         </Alert>
       )}
       <Box sx={{ position: 'relative', display: 'inline-block', mb: 2 }}>
-        {originalUrl && (
+        {imageUrl && (
           <img
             ref={imageRef}
-            src={originalUrl}
+            src={imageUrl}
             alt="Photo"
             style={{ maxWidth: '100%', height: 'auto' }}
           />
@@ -246,6 +269,9 @@ const PhotoDetailPage = ({ token }) => {
         <Button variant="contained" onClick={handleQueueBlur} sx={{ mr: 2 }}>
           Queue Blur Generation
         </Button>
+        <Button variant="outlined" onClick={handleOpenOriginal} sx={{ mr: 2 }}>
+          Open Original
+        </Button>
         <Button variant="outlined" onClick={handleFetchBlurred} sx={{ mr: 2 }}>
           Show Blurred Version
         </Button>
@@ -26,7 +26,13 @@ const UploadPage = ({ token }) => {
       });
       setUploadedIds(response.data);
     } catch (err) {
-      setError(err.response?.data?.detail || 'Upload failed');
+      const detail = err.response?.data?.detail;
+      if (Array.isArray(detail)) {
+        // Per-file errors: [{ filename, error }]
+        setError(detail.map((d) => `${d.filename}: ${d.error}`).join('; '));
+      } else {
+        setError(detail || 'Upload failed');
+      }
     }
   };
 
@@ -0,0 +1 @@
+"""Tests for PrivacyGuard. Run with `python -m pytest tests` from the `privacyguard` directory."""
@@ -0,0 +1,96 @@
+"""
+Shared fixtures for the test suite.
+
+The API and the worker tasks run in process against the stand-ins of
+`benchmarks.local_stack`: a SQLite file, an in-memory S3, the fake
+Rekognition service and a queue that records tasks instead of delivering
+them. Run from the `privacyguard` directory:
+
+    python -m pytest tests
+"""
+import os
+import random
+import tempfile
+
+import pytest
+
+from benchmarks import local_stack
+from benchmarks.bench_e2e import make_jpeg
+
+# The engine is created when `backend.app` is imported: configure first.
+local_stack.configure(
+    os.path.join(tempfile.mkdtemp(prefix="privacyguard_tests_"), "test.db"),
+    FAKE_REKOGNITION_SEED="0",
+    FAKE_REKOGNITION_MAX_FACES="4",
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend.app import database, main, migrations, models  # noqa: E402
+from worker import tasks  # noqa: E402
+
+
+@pytest.fixture
+def s3():
+    return local_stack.FakeS3()
+
+
+@pytest.fixture
+def queue():
+    return local_stack.TaskQueue()
+
+
+@pytest.fixture
+def empty_db():
+    """Create the schema, and empty every table but the users once the test is over."""
+    migrations.upgrade(database.engine)
+    yield
+    with database.engine.begin() as connection:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            if table.name not in ("users", "sessions"):
+                connection.execute(table.delete())
+
+
+@pytest.fixture
+def client(empty_db, s3, queue):
+    """An authenticated client of the sync API, on an empty database."""
+    local_stack.install(s3, queue)
+    with TestClient(main.app) as client:
+        token = client.post("/login", data={"username": "admin", "password": "admin"}).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+
+
+@pytest.fixture
+def run_tasks(queue):
+    """Return a function running every queued task, including those they enqueue."""
+
+    def run() -> None:
+        while queue.pending:
+            name, args, kwargs = queue.pending.popleft()
+            getattr(tasks, name.rsplit(".", 1)[1]).run(*args, **kwargs)
+
+    return run
+
+
+@pytest.fixture
+def db(empty_db):
+    """A session on the test database."""
+    with database.session_scope() as session:
+        yield session
+
+
+@pytest.fixture
+def upload(client):
+    """Return a function uploading `count` distinct synthetic JPEGs and returning their ids."""
+    rng = random.Random(0)
+
+    def upload(count: int, size=(320, 240)) -> list:
+        files = [
+            ("files", (f"IMG_{i:04d}.jpg", make_jpeg(*size, faces=2, rng=rng), "image/jpeg")) for i in range(count)
+        ]
+        response = client.post("/upload", files=files)
+        response.raise_for_status()
+        return response.json()
+
+    return upload
@@ -0,0 +1,137 @@
+"""Batched photo processing and how uploads are split into detection tasks."""
+import io
+import random
+
+import pytest
+from PIL import Image
+from sqlalchemy import event
+
+from backend.app import database, models
+from benchmarks.bench_e2e import make_jpeg
+from worker import detection_proxy, tasks
+
+
+def jpeg(seed: int) -> bytes:
+    return make_jpeg(320, 240, faces=2, rng=random.Random(seed))
+
+
+def reencode(data: bytes, quality: int = 60) -> bytes:
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(data)).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def post(client, contents) -> list:
+    files = [("files", (f"IMG_{i:04d}.jpg", data, "image/jpeg")) for i, data in enumerate(contents)]
+    response = client.post("/upload", files=files)
+    response.raise_for_status()
+    return response.json()
+
+
+class CountingRekognition:
+    """Wraps the Rekognition client, counting DetectFaces calls and failing on chosen images."""
+
+    def __init__(self, client, failing=()):
+        self.client = client
+        self.failing = set(failing)
+        self.detected = []
+
+    def detect_faces(self, Image, **kwargs):
+        self.detected.append(Image["Bytes"])
+        if Image["Bytes"] in self.failing:
+            raise RuntimeError("DetectFaces failed")
+        return self.client.detect_faces(Image=Image, **kwargs)
+
+
+@pytest.fixture
+def rekognition(monkeypatch):
+    wrapper = CountingRekognition(tasks.get_rekognition_client())
+    monkeypatch.setattr(tasks, "get_rekognition_client", lambda: wrapper)
+    return wrapper
+
+
+def run_batch(queue) -> list:
+    """Run the queued batch task, returning the ids it covered."""
+    (name, args, _), = queue.drain("worker.tasks.process_photos_batch")
+    tasks.process_photos_batch.run(*args)
+    return args[0]
+
+
+@pytest.fixture
+def commits():
+    counted = []
+
+    def on_commit(conn):
+        counted.append(conn)
+
+    event.listen(database.engine, "commit", on_commit)
+    yield counted
+    event.remove(database.engine, "commit", on_commit)
+
+
+def test_batch_processes_every_photo_with_one_final_commit(client, queue, db, rekognition, commits):
+    ids = post(client, [jpeg(seed) for seed in range(4)])
+    commits.clear()
+    assert run_batch(queue) == ids
+    # PROCESSING for the whole batch, then the results of the whole batch.
+    assert len(commits) == 2
+    assert len(rekognition.detected) == 4
+    photos = [db.get(models.Photo, photo_id) for photo_id in ids]
+    assert all(photo.status == models.PhotoStatus.PROCESSED for photo in photos)
+    assert all(photo.has_renditions for photo in photos)
+    assert all(photo.face_count == len(photo.faces) for photo in photos)
+    with_faces = [photo.id for photo in photos if photo.faces]
+    assert with_faces
+    assert [args for _, args, _ in queue.drain("worker.tasks.generate_blur")] == [[i] for i in with_faces]
+
+
+def test_failing_photo_does_not_undo_the_others(client, queue, s3, db, rekognition):
+    contents = [jpeg(seed) for seed in range(4)]
+    ids = post(client, contents)
+    photos = [db.get(models.Photo, photo_id) for photo_id in ids]
+    # The original of the first photo is gone, detection fails on the second.
+    del s3.objects[photos[0].s3_key]
+    rekognition.failing.add(detection_proxy.make_proxy(contents[1]))
+    run_batch(queue)
+    db.expire_all()
+    assert all(photo.status == models.PhotoStatus.PROCESSED for photo in photos)
+    assert photos[0].faces == [] and not photos[0].has_renditions
+    assert photos[1].faces == [] and photos[1].has_renditions
+    assert all(photo.faces and photo.face_count == len(photo.faces) for photo in photos[2:])
+
+
+def test_burst_in_one_batch_is_detected_once(client, queue, db, rekognition, monkeypatch):
+    monkeypatch.setenv("PHASH_MAX_DISTANCE", "10")
+    leader = jpeg(1)
+    ids = post(client, [leader, reencode(leader, 70), jpeg(2), reencode(leader, 50)])
+    run_batch(queue)
+    assert len(rekognition.detected) == 2
+    first, second, other, third = (db.get(models.Photo, photo_id) for photo_id in ids)
+    assert first.near_duplicate_of is None and other.near_duplicate_of is None
+    assert second.near_duplicate_of == first.id
+    assert third.near_duplicate_of in (first.id, second.id)
+    boxes = [face.bbox for face in first.faces]
+    assert boxes
+    for duplicate in (second, third):
+        assert [face.bbox for face in duplicate.faces] == boxes
+        assert duplicate.face_count == len(boxes)
+
+
+@pytest.mark.parametrize("count, batch_size, expected", [
+    (1, 10, [("worker.tasks.process_photo", 1)]),
+    (3, 10, [("worker.tasks.process_photos_batch", 3)]),
+    (5, 2, [
+        ("worker.tasks.process_photos_batch", 2),
+        ("worker.tasks.process_photos_batch", 2),
+        ("worker.tasks.process_photo", 1),
+    ]),
+])
+def test_upload_splits_detection_into_batches(client, queue, monkeypatch, count, batch_size, expected):
+    monkeypatch.setenv("PROCESS_BATCH_SIZE", str(batch_size))
+    ids = post(client, [jpeg(seed) for seed in range(count)])
+    queued = list(queue.pending)
+    assert [(name, len(args[0]) if isinstance(args[0], list) else 1) for name, args, _ in queued] == expected
+    covered = []
+    for name, args, _ in queued:
+        covered.extend(args[0] if isinstance(args[0], list) else args)
+    assert covered == ids
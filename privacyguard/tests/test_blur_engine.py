@@ -0,0 +1,73 @@
+"""Pixel boxes and the multi-process blur engine."""
+import numpy as np
+import pytest
+from PIL import Image
+
+from worker import redaction
+from worker.blur_engine import BlurEngine, group_overlapping
+from worker.tasks import blur_faces_in_image
+
+
+def test_pixel_box_is_clipped_not_shifted():
+    # Starts 10px left of and 20px above the frame: only the visible part stays.
+    bbox = {"left": -0.1, "top": -0.2, "width": 0.3, "height": 0.4}
+    assert redaction.to_pixel_box(bbox, 100, 100) == (0, 0, 20, 20)
+    bbox = {"left": 0.9, "top": 0.8, "width": 0.3, "height": 0.4}
+    assert redaction.to_pixel_box(bbox, 100, 100) == (90, 80, 100, 100)
+
+
+def test_group_overlapping():
+    boxes = [(0, 0, 10, 10), (5, 5, 15, 15), (14, 14, 20, 20), (30, 30, 40, 40)]
+    groups = sorted(sorted(group) for group in group_overlapping(boxes))
+    assert groups == [[(0, 0, 10, 10), (5, 5, 15, 15), (14, 14, 20, 20)], [(30, 30, 40, 40)]]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = BlurEngine(workers=2, min_pixels=0)
+    yield engine
+    engine.shutdown()
+
+
+def make_job(seed: int = 0):
+    rng = np.random.default_rng(seed)
+    image = Image.fromarray(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8))
+    boxes = [
+        {"left": -0.05, "top": 0.1, "width": 0.3, "height": 0.3},
+        {"left": 0.2, "top": 0.2, "width": 0.2, "height": 0.2},
+        {"left": 0.7, "top": 0.6, "width": 0.4, "height": 0.5},
+    ]
+    return image, boxes
+
+
+@pytest.mark.parametrize("mode", [redaction.GAUSSIAN, redaction.PIXELATE])
+def test_pool_matches_in_process_blur(engine, mode):
+    jobs = [make_job(0), make_job(1)]
+    expected = [redaction.redact_image(image, boxes, mode) for image, boxes in jobs]
+    results = engine.blur_many(jobs, mode)
+    assert engine._executor is not None
+    for result, reference in zip(results, expected):
+        assert np.array_equal(np.asarray(result), np.asarray(reference))
+
+
+@pytest.mark.parametrize(
+    "mode, boxes",
+    [
+        (redaction.BOX, make_job()[1]),
+        # One overlap group makes a single task in gaussian mode too.
+        (redaction.GAUSSIAN, make_job()[1][:2]),
+    ],
+)
+def test_single_task_stays_in_process(mode, boxes):
+    engine = BlurEngine(workers=2, min_pixels=0)
+    image = make_job()[0]
+    result = engine.blur(image, boxes, mode)
+    assert engine._executor is None
+    assert np.array_equal(np.asarray(result), np.asarray(redaction.redact_image(image, boxes, mode)))
+
+
+def test_reference_blur_clips_like_the_engine(engine):
+    image, boxes = make_job()
+    expected = blur_faces_in_image(image, boxes)
+    assert np.array_equal(np.asarray(engine.blur(image, boxes)), np.asarray(expected))
+    assert np.array_equal(np.asarray(redaction.redact_image(image, boxes)), np.asarray(expected))
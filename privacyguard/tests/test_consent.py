@@ -0,0 +1,101 @@
+"""Per-photo consent counters and the exports that rely on them."""
+import io
+import zipfile
+
+from backend.app import consent, models
+
+
+def photo_with_faces(client, upload, run_tasks) -> dict:
+    upload(6)
+    run_tasks()
+    photos = [photo for photo in client.get("/photos").json() if len(photo["faces"]) >= 2]
+    assert photos, "the fake detector found no photo with two faces"
+    return photos[0]
+
+
+def set_consent(client, photo: dict, face: dict, status: str) -> None:
+    response = client.post(
+        f"/photos/{photo['id']}/faces/{face['id']}/consent", json={"consent_status": status}
+    )
+    response.raise_for_status()
+
+
+def counters(db, photo_id: int) -> tuple:
+    db.expire_all()
+    photo = db.get(models.Photo, photo_id)
+    return (
+        photo.face_count,
+        photo.approved_count,
+        photo.pending_count,
+        photo.rejected_count,
+        photo.consent_summary,
+    )
+
+
+def test_summarize():
+    assert consent.summarize(0, 0, 0) == models.ConsentSummary.NO_FACES
+    assert consent.summarize(2, 0, 0) == models.ConsentSummary.APPROVED
+    assert consent.summarize(2, 1, 0) == models.ConsentSummary.PENDING
+    assert consent.summarize(2, 1, 1) == models.ConsentSummary.REJECTED
+
+
+def test_detection_sets_counters(client, upload, run_tasks, db):
+    upload(6)
+    run_tasks()
+    for photo in db.query(models.Photo):
+        assert photo.face_count == photo.pending_count == len(photo.faces)
+        assert photo.approved_count == photo.rejected_count == 0
+        expected = models.ConsentSummary.PENDING if photo.faces else models.ConsentSummary.NO_FACES
+        assert photo.consent_summary == expected
+
+
+def test_consent_changes_move_counters(client, upload, run_tasks, db):
+    photo = photo_with_faces(client, upload, run_tasks)
+    faces = photo["faces"]
+    n = len(faces)
+    set_consent(client, photo, faces[0], "rejected")
+    assert counters(db, photo["id"]) == (n, 0, n - 1, 1, models.ConsentSummary.REJECTED)
+    # Repeating a change must not count it twice.
+    set_consent(client, photo, faces[0], "rejected")
+    assert counters(db, photo["id"]) == (n, 0, n - 1, 1, models.ConsentSummary.REJECTED)
+    for face in faces:
+        set_consent(client, photo, face, "approved")
+    assert counters(db, photo["id"]) == (n, n, 0, 0, models.ConsentSummary.APPROVED)
+    set_consent(client, photo, faces[-1], "pending")
+    assert counters(db, photo["id"]) == (n, n - 1, 1, 0, models.ConsentSummary.PENDING)
+
+
+def test_consent_filter(client, upload, run_tasks):
+    photo = photo_with_faces(client, upload, run_tasks)
+    for face in photo["faces"]:
+        set_consent(client, photo, face, "approved")
+    approved = client.get("/photos", params={"consent": "approved"}).json()
+    assert [p["id"] for p in approved] == [photo["id"]]
+    pending = client.get("/photos", params={"consent": "pending"}).json()
+    assert photo["id"] not in [p["id"] for p in pending]
+    assert all(p["consent_summary"] == "pending" for p in pending)
+
+
+def test_recount_repairs_drift(client, upload, run_tasks, db):
+    photo = photo_with_faces(client, upload, run_tasks)
+    set_consent(client, photo, photo["faces"][0], "rejected")
+    row = db.get(models.Photo, photo["id"])
+    row.pending_count = -1
+    row.rejected_count = 0
+    row.consent_summary = models.ConsentSummary.APPROVED
+    db.commit()
+    assert consent.recount(db, batch_size=2) == db.query(models.Photo).count()
+    n = len(photo["faces"])
+    assert counters(db, photo["id"]) == (n, 0, n - 1, 1, models.ConsentSummary.REJECTED)
+
+
+def test_approved_export_ignores_drifted_summary(client, upload, run_tasks, db):
+    photo = photo_with_faces(client, upload, run_tasks)
+    set_consent(client, photo, photo["faces"][0], "rejected")
+    row = db.get(models.Photo, photo["id"])
+    row.consent_summary = models.ConsentSummary.APPROVED
+    db.commit()
+    response = client.get("/export/approved")
+    response.raise_for_status()
+    names = zipfile.ZipFile(io.BytesIO(response.content)).namelist()
+    assert photo["filename"] not in names
@@ -0,0 +1,43 @@
+"""Downscaled proxies sent to face detection."""
+import io
+
+from PIL import Image
+
+from worker import detection_proxy
+
+
+def jpeg(width: int, height: int, quality: int = 95) -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def size_of(data: bytes):
+    return Image.open(io.BytesIO(data)).size
+
+
+def test_small_image_is_passed_through():
+    data = jpeg(400, 300)
+    assert detection_proxy.make_proxy(data, long_edge=400) is data
+    assert detection_proxy.make_proxy(data, long_edge=0) is data
+
+
+def test_large_image_is_downscaled():
+    data = jpeg(1200, 900)
+    proxy = detection_proxy.make_proxy(data, long_edge=320)
+    assert size_of(proxy) == (320, 240)
+    assert len(proxy) < len(data)
+
+
+def test_over_cap_image_is_shrunk_without_long_edge():
+    data = jpeg(1200, 900)
+    max_bytes = len(data) // 5
+    proxy = detection_proxy.make_proxy(data, long_edge=0, max_bytes=max_bytes)
+    assert len(proxy) <= max_bytes
+    width, height = size_of(proxy)
+    assert width < 1200 and width * 3 == height * 4
+
+
+def test_undecodable_data_is_passed_through():
+    data = b"not an image" * 1000
+    assert detection_proxy.make_proxy(data, long_edge=320, max_bytes=10) is data
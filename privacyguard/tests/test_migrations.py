@@ -0,0 +1,46 @@
+"""In-place schema upgrades of databases created by earlier releases."""
+from sqlalchemy import create_engine, inspect, text
+
+from backend.app import migrations, models
+
+
+def old_database(path):
+    """A database whose `photos` table predates the columns added since."""
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE photos (id INTEGER PRIMARY KEY, filename VARCHAR NOT NULL, "
+            "s3_key VARCHAR NOT NULL UNIQUE, upload_time DATETIME, status VARCHAR(10) NOT NULL)"
+        ))
+        connection.execute(text(
+            "INSERT INTO photos (filename, s3_key, upload_time, status) "
+            "VALUES ('a.jpg', 'a.jpg', '2024-01-01 00:00:00', 'PROCESSED')"
+        ))
+    return engine
+
+
+def test_upgrade_adds_missing_columns_and_indexes(tmp_path):
+    engine = old_database(tmp_path / "old.db")
+    added = migrations.upgrade(engine)
+
+    inspector = inspect(engine)
+    photo_columns = {column["name"] for column in inspector.get_columns("photos")}
+    assert photo_columns == set(models.Photo.__table__.columns.keys())
+    assert added == {("photos", name) for name in photo_columns - {"id", "filename", "s3_key", "upload_time", "status"}}
+    indexes = {index["name"] for index in inspector.get_indexes("photos")}
+    assert {index.name for index in models.Photo.__table__.indexes} <= indexes
+    assert "faces" in inspector.get_table_names()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT filename FROM photos")).scalars().all() == ["a.jpg"]
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    engine = old_database(tmp_path / "old.db")
+    assert migrations.upgrade(engine)
+    assert migrations.upgrade(engine) == set()
+
+
+def test_new_database_needs_no_backfill(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    assert migrations.upgrade(engine) == set()
+    assert set(inspect(engine).get_table_names()) == set(models.Base.metadata.tables)
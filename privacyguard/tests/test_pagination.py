@@ -0,0 +1,77 @@
+"""Keyset pagination of GET /photos."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app import models, pagination
+
+
+def fetch_all(client, limit: int, **params) -> list:
+    pages = []
+    cursor = None
+    while True:
+        query = dict(params, limit=limit, **({"cursor": cursor} if cursor else {}))
+        response = client.get("/photos", params=query)
+        response.raise_for_status()
+        pages.append([photo["id"] for photo in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+def set_upload_times(db, times: dict) -> None:
+    for photo_id, upload_time in times.items():
+        db.get(models.Photo, photo_id).upload_time = upload_time
+    db.commit()
+
+
+def test_cursor_round_trip():
+    photo = models.Photo(id=42, upload_time=datetime(2024, 5, 1, 12, 30, 15, 123456))
+    assert pagination.decode_cursor(pagination.encode_cursor(photo)) == (photo.upload_time, 42)
+
+
+def test_pages_cover_every_photo_once_newest_first(client, upload, db):
+    ids = upload(7)
+    base = datetime(2024, 1, 1)
+    # Several photos share an upload time: the id breaks the tie.
+    times = {photo_id: base + timedelta(minutes=i // 3) for i, photo_id in enumerate(ids)}
+    set_upload_times(db, times)
+    pages = fetch_all(client, limit=3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    listed = [photo_id for page in pages for photo_id in page]
+    assert listed == sorted(ids, key=lambda photo_id: (times[photo_id], photo_id), reverse=True)
+
+
+def test_exact_multiple_of_limit_has_no_empty_page(client, upload):
+    upload(4)
+    assert [len(page) for page in fetch_all(client, limit=2)] == [2, 2]
+
+
+def test_date_filters(client, upload, db):
+    ids = upload(4)
+    set_upload_times(db, {photo_id: datetime(2024, 1, 1 + i) for i, photo_id in enumerate(ids)})
+    pages = fetch_all(client, limit=10, uploaded_after="2024-01-02T00:00:00", uploaded_before="2024-01-04T00:00:00")
+    assert pages == [[ids[2], ids[1]]]
+
+
+def test_status_filter(client, upload, run_tasks):
+    processed = upload(2)
+    run_tasks()
+    queued = upload(2)
+    assert fetch_all(client, limit=10, status="processed") == [sorted(processed, reverse=True)]
+    assert fetch_all(client, limit=10, status="in_queue") == [sorted(queued, reverse=True)]
+
+
+def test_invalid_cursor(client):
+    response = client.get("/photos", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [0, 501])
+def test_limit_bounds(client, limit):
+    assert client.get("/photos", params={"limit": limit}).status_code == 422
+
+
+def test_filter_parameter_names(client):
+    parameters = client.get("/openapi.json").json()["paths"]["/photos"]["get"]["parameters"]
+    assert {"status", "consent"} <= {parameter["name"] for parameter in parameters}
@@ -0,0 +1,93 @@
+"""Perceptual hashing and near-duplicate lookup."""
+import io
+import random
+
+from PIL import Image
+
+from backend.app import models, phash
+from benchmarks.bench_e2e import make_jpeg
+
+
+def reencode(data: bytes, quality: int) -> Image.Image:
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(data)).save(buffer, format="JPEG", quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+def add_photo(db, value: int, status=models.PhotoStatus.PROCESSED) -> models.Photo:
+    photo = models.Photo(filename="x.jpg", s3_key=f"{random.getrandbits(64):016x}.jpg", status=status)
+    phash.assign(photo, value)
+    db.add(photo)
+    db.commit()
+    return photo
+
+
+def test_dhash_survives_reencoding():
+    data = make_jpeg(640, 480, faces=2, rng=random.Random(1))
+    original = phash.dhash(Image.open(io.BytesIO(data)))
+    assert phash.hamming(original, phash.dhash(reencode(data, 60))) <= phash.EXACT_MAX_DISTANCE
+
+
+def test_dhash_separates_different_scenes():
+    first = phash.dhash(Image.open(io.BytesIO(make_jpeg(640, 480, faces=2, rng=random.Random(1)))))
+    second = phash.dhash(Image.open(io.BytesIO(make_jpeg(640, 480, faces=2, rng=random.Random(2)))))
+    assert phash.hamming(first, second) > phash.EXACT_MAX_DISTANCE
+
+
+def test_dhash_of_gradient():
+    # Brightness falls from left to right in every row: all bits set.
+    assert phash.dhash(Image.linear_gradient("L").rotate(-90)) == (1 << 64) - 1
+    assert phash.dhash(Image.new("L", (90, 80), 128)) == 0
+
+
+def test_signed_storage_and_chunks():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = phash.to_signed(value)
+        assert -(1 << 63) <= signed < 1 << 63
+        assert phash.to_unsigned(signed) == value
+    assert phash.split(0x0123456789ABCDEF) == [0x0123, 0x4567, 0x89AB, 0xCDEF]
+    assert phash.hamming(0b1011, 0b0110) == 3
+
+
+def test_lookup_is_disabled_by_default(db, monkeypatch):
+    monkeypatch.delenv("PHASH_MAX_DISTANCE", raising=False)
+    add_photo(db, 0x0123456789ABCDEF)
+    assert phash.find_near_duplicate(db, 0x0123456789ABCDEF) is None
+
+
+def test_lookup_finds_closest_processed_photo(db):
+    value = 0x0123456789ABCDEF
+    far = add_photo(db, value ^ 0b111)
+    near = add_photo(db, value ^ 0b1)
+    add_photo(db, value, status=models.PhotoStatus.IN_QUEUE)
+    # Differs in every chunk, hence never a candidate.
+    add_photo(db, value ^ 0x0001000100010001)
+    found = phash.find_near_duplicate(db, value, max_distance=3)
+    assert found.id == near.id
+    assert phash.find_near_duplicate(db, value, exclude_id=near.id, max_distance=3).id == far.id
+    assert phash.find_near_duplicate(db, value ^ 0xF0, exclude_id=near.id, max_distance=2) is None
+
+
+def test_lookup_compares_a_bounded_number_of_candidates(db, monkeypatch):
+    value = 0
+    # Flat frames: many photos sharing the zero chunks.
+    close = add_photo(db, 1)
+    for _ in range(5):
+        add_photo(db, 0xFF)
+    monkeypatch.setenv("PHASH_MAX_CANDIDATES", "3")
+    assert phash.find_near_duplicate(db, value, max_distance=3) is None
+    monkeypatch.setenv("PHASH_MAX_CANDIDATES", "10")
+    assert phash.find_near_duplicate(db, value, max_distance=3).id == close.id
+
+
+def test_burst_shots_are_detected_separately_by_default(client, run_tasks, db, monkeypatch):
+    monkeypatch.delenv("PHASH_MAX_DISTANCE", raising=False)
+    data = make_jpeg(640, 480, faces=2, rng=random.Random(3))
+    burst = [data, reencode(data, 70).fp.getvalue()]
+    for i, shot in enumerate(burst):
+        client.post("/upload", files=[("files", (f"burst_{i}.jpg", shot, "image/jpeg"))]).raise_for_status()
+        run_tasks()
+    photos = db.query(models.Photo).order_by(models.Photo.id).all()
+    assert len(photos) == 2
+    assert phash.hamming(phash.to_unsigned(photos[0].phash), phash.to_unsigned(photos[1].phash)) <= 3
+    assert photos[1].near_duplicate_of is None
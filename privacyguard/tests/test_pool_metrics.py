@@ -0,0 +1,57 @@
+"""Connection pool settings and the `/metrics/db-pool` endpoint."""
+import pytest
+
+from backend.app import async_io
+from backend.app.pool_metrics import InstrumentedAsyncAdaptedQueuePool, PoolMetrics
+
+
+@pytest.fixture
+def async_metrics(monkeypatch):
+    metrics = PoolMetrics()
+    monkeypatch.setattr(async_io, "pool_metrics", metrics)
+    return metrics
+
+
+def test_metrics_require_authentication(client):
+    response = client.get("/metrics/db-pool", headers={"Authorization": ""})
+    assert response.status_code == 401
+
+
+def test_metrics_report_the_settings_in_effect(client):
+    metrics = client.get("/metrics/db-pool").json()
+    # SQLite keeps its default pool: the API role's settings do not apply.
+    assert metrics["settings"]["pool_class"] == "QueuePool"
+    assert metrics["settings"]["pool_size"] == metrics["pool_size"] == 5
+    assert "async" not in metrics
+
+
+def test_async_engine_uses_the_role_pool_options(client, async_metrics, monkeypatch):
+    monkeypatch.setenv("DB_API_POOL_SIZE", "7")
+    monkeypatch.setenv("DB_POOL_MAX_OVERFLOW", "3")
+    engine = async_io._create_async_engine("postgresql+asyncpg://user:secret@db/privacyguard")
+    try:
+        pool = engine.sync_engine.pool
+        assert isinstance(pool, InstrumentedAsyncAdaptedQueuePool)
+        assert pool.metrics is async_metrics
+        settings = client.get("/metrics/db-pool").json()["async"]["settings"]
+        assert settings == {
+            "pool_class": "InstrumentedAsyncAdaptedQueuePool",
+            "pool_size": 7,
+            "max_overflow": 3,
+            "pool_timeout": 30,
+            "pool_recycle": 1800,
+            "pool_pre_ping": True,
+        }
+    finally:
+        engine.sync_engine.dispose()
+
+
+def test_async_sqlite_engine_keeps_its_own_pool(async_metrics, tmp_path):
+    engine = async_io._create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+    try:
+        assert async_metrics.pool is engine.sync_engine.pool
+        settings = async_metrics.settings()
+        assert settings["pool_class"] == "AsyncAdaptedQueuePool"
+        assert settings["pool_size"] == 5 and settings["max_overflow"] == 10
+    finally:
+        engine.sync_engine.dispose()
@@ -0,0 +1,85 @@
+"""Windowed, ordered prefetching of S3 objects."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app import storage
+
+
+def test_results_keep_input_order():
+    def fetch(item):
+        # Earlier items finish last.
+        time.sleep((10 - item) * 0.005)
+        return item * item
+
+    assert list(storage.prefetch(fetch, range(10), window=4)) == [(i, i * i) for i in range(10)]
+
+
+def test_window_bounds_outstanding_fetches():
+    lock = threading.Lock()
+    running = 0
+    most = 0
+    pulled = []
+
+    def fetch(item):
+        nonlocal running, most
+        with lock:
+            running += 1
+            most = max(most, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return item
+
+    def items():
+        for i in range(20):
+            pulled.append(i)
+            yield i
+
+    consumed = 0
+    for item, _ in storage.prefetch(fetch, items(), window=3):
+        consumed += 1
+        # Read ahead of the consumer by at most the window.
+        assert len(pulled) <= consumed + 3
+    assert consumed == 20
+    assert most == 3
+
+
+def test_closing_early_cancels_pending_fetches(monkeypatch):
+    submitted = []
+
+    class SingleThreadExecutor(ThreadPoolExecutor):
+        """One thread, so that fetches queue up behind a blocked one."""
+
+        def __init__(self, max_workers=None, **kwargs):
+            super().__init__(max_workers=1, **kwargs)
+
+        def submit(self, fn, *args, **kwargs):
+            future = super().submit(fn, *args, **kwargs)
+            submitted.append(future)
+            return future
+
+    monkeypatch.setattr(storage, "ThreadPoolExecutor", SingleThreadExecutor)
+    started = threading.Event()
+    release = threading.Event()
+    fetched = []
+
+    def fetch(item):
+        fetched.append(item)
+        if item == 1:
+            started.set()
+            release.wait(5)
+        return item
+
+    results = storage.prefetch(fetch, range(100), window=3)
+    assert next(results) == (0, 0)
+    assert started.wait(5)
+    start = time.perf_counter()
+    results.close()
+    # The consumer does not wait for the fetch still running.
+    assert time.perf_counter() - start < 1
+    release.set()
+    submitted[1].result(5)
+    assert len(submitted) == 4
+    assert all(future.cancelled() for future in submitted[2:])
+    assert fetched == [0, 1]
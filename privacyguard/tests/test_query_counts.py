@@ -0,0 +1,76 @@
+"""
+Query-count regressions for the photo listing and export endpoints.
+
+Faces are eager-loaded with `selectinload` and the exports read their
+selection in one statement, so the number of statements per request must
+not grow with the number of photos.
+"""
+import contextlib
+
+import pytest
+from sqlalchemy import event
+
+from backend.app import database
+
+
+@contextlib.contextmanager
+def count_queries():
+    statements = []
+
+    def on_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", on_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(database.engine, "before_cursor_execute", on_execute)
+
+
+def listing_queries(client, path: str) -> int:
+    with count_queries() as statements:
+        response = client.get(path)
+    response.raise_for_status()
+    return len(statements)
+
+
+@pytest.mark.parametrize("path", ["/photos", "/photos?limit=5", "/photos?status=processed"])
+def test_listing_queries_do_not_grow_with_page_size(client, upload, run_tasks, path):
+    upload(3)
+    run_tasks()
+    few = listing_queries(client, path)
+    upload(12)
+    run_tasks()
+    many = listing_queries(client, path)
+    assert many == few
+    # Current user, photos and their faces.
+    assert many <= 3
+
+
+def test_listing_returns_faces(client, upload, run_tasks):
+    ids = upload(6)
+    run_tasks()
+    photos = client.get("/photos").json()
+    assert sorted(photo["id"] for photo in photos) == sorted(ids)
+    assert sum(len(photo["faces"]) for photo in photos) == sum(photo["face_count"] for photo in photos) > 0
+
+
+def test_photo_detail_loads_faces_in_one_query(client, upload, run_tasks):
+    photo_id = upload(1)[0]
+    run_tasks()
+    assert listing_queries(client, f"/photos/{photo_id}") <= 3
+
+
+@pytest.mark.parametrize("path", ["/export/approved", "/export/privacy-safe"])
+def test_export_queries_do_not_grow_with_dataset(client, upload, run_tasks, path):
+    upload(3)
+    run_tasks()
+    # The streamed archive is read whole by the test client, so statements
+    # issued while the response body is produced are counted as well.
+    few = listing_queries(client, path)
+    upload(12)
+    run_tasks()
+    many = listing_queries(client, path)
+    assert many == few
+    # Current user and the selection.
+    assert many <= 2
@@ -0,0 +1,91 @@
+"""Redaction backends of `worker.redaction`."""
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.app import models
+from worker import redaction
+
+BOX = {"left": 0.25, "top": 0.25, "width": 0.5, "height": 0.5}
+
+
+def noisy_image(width: int = 200, height: int = 160) -> Image.Image:
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+
+def inside_mask(width: int, height: int, bbox: dict) -> np.ndarray:
+    left, top, right, bottom = redaction.to_pixel_box(bbox, width, height)
+    mask = np.zeros((height, width), dtype=bool)
+    mask[top:bottom, left:right] = True
+    return mask
+
+
+@pytest.mark.parametrize("mode", redaction.MODES)
+def test_only_the_box_changes(mode):
+    image = noisy_image()
+    result = redaction.redact_image(image, [BOX], mode)
+    before, after = np.asarray(image), np.asarray(result)
+    mask = inside_mask(image.width, image.height, BOX)
+    assert np.array_equal(before[~mask], after[~mask])
+    # Noise has a high variance; every redaction flattens it.
+    assert after[mask].astype(float).std() < before[mask].astype(float).std() / 2
+    # The input image is left untouched.
+    assert np.array_equal(np.asarray(image), before)
+
+
+def test_fill_paints_solid_colour():
+    image = noisy_image()
+    after = np.asarray(redaction.redact_image(image, [BOX], redaction.FILL))
+    assert (after[inside_mask(image.width, image.height, BOX)] == redaction.FILL_COLOR).all()
+
+
+def test_box_blur_keeps_uniform_areas():
+    image = Image.new("RGB", (120, 90), (10, 200, 30))
+    after = np.asarray(redaction.redact_image(image, [BOX], redaction.BOX))
+    assert (after == (10, 200, 30)).all()
+
+
+def test_pixelate_blocks_are_uniform():
+    image = noisy_image(160, 160)
+    pixels = np.array(image)
+    redaction.pixelate(pixels, [(40, 40, 120, 120)], block=8)
+    region = pixels[40:120, 40:120]
+    blocks = region.reshape(10, 8, 10, 8, 3)
+    assert (blocks == blocks[:, :1, :, :1, :]).all()
+
+
+def test_empty_and_degenerate_boxes_are_ignored():
+    image = noisy_image()
+    degenerate = {"left": 0.5, "top": 0.5, "width": 0.0, "height": 0.2}
+    for mode in redaction.MODES:
+        assert np.array_equal(np.asarray(redaction.redact_image(image, [degenerate], mode)), np.asarray(image))
+        assert np.array_equal(np.asarray(redaction.redact_image(image, [], mode)), np.asarray(image))
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        redaction.redact_image(noisy_image(), [BOX], "smudge")
+
+
+def test_api_rejects_unknown_mode(client, upload):
+    photo_id = upload(1)[0]
+    assert client.post(f"/photos/{photo_id}/blur", params={"mode": "smudge"}).status_code == 422
+    assert client.post(f"/photos/{photo_id}/blur", params={"mode": "pixelate"}).status_code == 200
+
+
+def test_mode_chosen_for_a_photo_is_kept(client, upload, run_tasks, db):
+    upload(6)
+    run_tasks()
+    photo = next(photo for photo in client.get("/photos").json() if photo["faces"])
+    client.post(f"/photos/{photo['id']}/blur", params={"mode": "pixelate"}).raise_for_status()
+    run_tasks()
+    assert client.get("/export/privacy-safe").headers["X-Blur-Pending"] == "0"
+    face = photo["faces"][0]
+    client.post(
+        f"/photos/{photo['id']}/faces/{face['id']}/consent", json={"consent_status": "rejected"}
+    ).raise_for_status()
+    run_tasks()
+    variant = db.query(models.BlurredVariant).filter_by(photo_id=photo["id"]).one()
+    assert (variant.mode, variant.is_stale) == ("pixelate", False)
+    assert client.get("/export/privacy-safe").headers["X-Blur-Pending"] == "0"
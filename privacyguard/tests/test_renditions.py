@@ -0,0 +1,77 @@
+"""Thumbnail and preview renditions and the endpoints serving them."""
+import io
+import random
+
+from PIL import Image
+
+from backend.app import models, renditions
+from benchmarks.bench_e2e import make_jpeg
+from worker import tasks
+
+
+def size_of(data: bytes):
+    return Image.open(io.BytesIO(data)).size
+
+
+def key_of(url: str) -> str:
+    return url.rsplit("/", 1)[1]
+
+
+def post(client, name: str, data: bytes) -> int:
+    response = client.post("/upload", files=[("files", (name, data, "image/jpeg"))])
+    response.raise_for_status()
+    return response.json()[0]
+
+
+def test_render_sizes_and_exif(monkeypatch):
+    monkeypatch.setenv("RENDITION_THUMB_EDGE", "40")
+    monkeypatch.setenv("RENDITION_PREVIEW_EDGE", "200")
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 300), "white").save(buffer, format="JPEG", exif=exif)
+    result = renditions.render(buffer.getvalue())
+    assert size_of(result[renditions.PREVIEW]) == (200, 150)
+    assert size_of(result[renditions.THUMB]) == (40, 30)
+    for data in result.values():
+        assert Image.open(io.BytesIO(data)).getexif()[0x0112] == 6
+
+
+def test_renditions_are_never_upscaled(monkeypatch):
+    monkeypatch.setenv("RENDITION_PREVIEW_EDGE", "1600")
+    result = renditions.render(make_jpeg(320, 240, faces=1, rng=random.Random(0)))
+    assert size_of(result[renditions.PREVIEW]) == (320, 240)
+
+
+def test_processing_stores_renditions(client, run_tasks, s3, db, monkeypatch):
+    monkeypatch.setenv("RENDITION_THUMB_EDGE", "64")
+    monkeypatch.setenv("RENDITION_PREVIEW_EDGE", "160")
+    photo_id = post(client, "a.jpg", make_jpeg(640, 480, faces=2, rng=random.Random(1)))
+    assert client.get(f"/photos/{photo_id}/thumbnail_url").status_code == 404
+    run_tasks()
+    photo = db.get(models.Photo, photo_id)
+    assert photo.has_renditions
+    expected = [(renditions.THUMB, "thumbnail_url", (64, 48)), (renditions.PREVIEW, "preview_url", (160, 120))]
+    for name, endpoint, size in expected:
+        response = client.get(f"/photos/{photo_id}/{endpoint}")
+        assert response.status_code == 200
+        key = key_of(response.json()["url"])
+        assert key == renditions.rendition_key(photo.s3_key, name)
+        assert size_of(s3.objects[key]) == size
+
+
+def test_missing_renditions_leave_the_original(client, queue, s3, db):
+    # Undecodable content: processing completes without renditions.
+    photo_id = post(client, "broken.jpg", b"not a jpeg" * 100)
+    (_, args, _), = queue.drain("worker.tasks.process_photo")
+    tasks.process_photo.run(*args)
+    photo = db.get(models.Photo, photo_id)
+    assert photo.status == models.PhotoStatus.PROCESSED
+    assert not photo.has_renditions
+    for endpoint in ("thumbnail_url", "preview_url"):
+        response = client.get(f"/photos/{photo_id}/{endpoint}")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Rendition not available"
+    # Clients fall back to the original.
+    assert key_of(client.get(f"/photos/{photo_id}/url").json()["url"]) == photo.s3_key
+    assert client.get("/photos/999999/thumbnail_url").json()["detail"] == "Photo not found"
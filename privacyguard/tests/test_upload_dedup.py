@@ -0,0 +1,52 @@
+"""Content-addressed ingest: uploads of known content reuse the existing photo."""
+import random
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from backend.app import main, models
+from benchmarks.bench_e2e import make_jpeg
+
+
+def post(client, contents) -> list:
+    files = [("files", (f"IMG_{i:04d}.jpg", data, "image/jpeg")) for i, data in enumerate(contents)]
+    response = client.post("/upload", files=files)
+    response.raise_for_status()
+    return response.json()
+
+
+def test_same_bytes_twice_reuse_the_photo(client, queue, run_tasks, s3, db):
+    data = make_jpeg(320, 240, faces=2, rng=random.Random(3))
+    (photo_id,) = post(client, [data])
+    run_tasks()
+    faces = sorted(face.id for face in db.get(models.Photo, photo_id).faces)
+    assert faces
+    keys = set(s3.objects)
+
+    assert post(client, [data]) == [photo_id]
+    # The fresh copy is gone and nothing is detected again.
+    assert set(s3.objects) == keys
+    assert not queue.pending
+    assert db.query(models.Photo).count() == 1
+    db.expire_all()
+    assert sorted(face.id for face in db.get(models.Photo, photo_id).faces) == faces
+    assert db.query(models.Face).count() == len(faces)
+
+
+def test_duplicates_within_one_upload(client, queue, s3):
+    first = make_jpeg(320, 240, faces=2, rng=random.Random(4))
+    second = make_jpeg(320, 240, faces=2, rng=random.Random(5))
+    ids = post(client, [first, second, first])
+    assert ids[0] == ids[2] != ids[1]
+    assert len(s3.objects) == 2
+    assert [args for _, args, _ in queue.pending] == [[ids[:2]]]
+
+
+def test_failed_insert_leaves_no_objects(client, s3, monkeypatch):
+    def conflict(*args, **kwargs):
+        raise IntegrityError("INSERT INTO photos", {}, Exception("duplicate key"))
+
+    monkeypatch.setattr(main, "_insert_uploaded_photos", conflict)
+    with pytest.raises(IntegrityError):
+        post(client, [make_jpeg(320, 240, faces=1, rng=random.Random(6))])
+    assert s3.objects == {}
@@ -0,0 +1,71 @@
+"""Blurred variants: storage keys and the blurred_url endpoint."""
+from backend.app import models, variants
+
+
+def photo_with_faces(client, upload, run_tasks) -> dict:
+    upload(6)
+    run_tasks()
+    return next(photo for photo in client.get("/photos").json() if photo["faces"])
+
+
+def blur_objects(s3, photo_key: str) -> list:
+    stem = photo_key.rsplit(".", 1)[0]
+    return sorted(key for key in s3.objects if key.startswith(f"{stem}_blur_"))
+
+
+def test_blur_key_depends_on_fingerprint():
+    assert variants.blur_key("abc.jpg", "0123456789abcdef") == "abc_blur_0123456789ab.jpg"
+    assert variants.blur_key("abc.jpg", "0123456789abcdef") != variants.blur_key("abc.jpg", "fedcba9876543210")
+
+
+def test_blurred_url_serves_only_current_variant(client, upload, run_tasks, queue, db, s3):
+    upload(6)
+    photo = next(photo for photo in client.get("/photos").json())
+    assert client.get(f"/photos/{photo['id']}/blurred_url").status_code == 404
+    run_tasks()
+    photo = next(photo for photo in client.get("/photos").json() if photo["faces"])
+    variant = db.query(models.BlurredVariant).filter_by(photo_id=photo["id"]).one()
+    response = client.get(f"/photos/{photo['id']}/blurred_url")
+    assert response.status_code == 200
+    assert response.json()["url"].endswith(variant.s3_key)
+
+    face = photo["faces"][0]
+    client.post(
+        f"/photos/{photo['id']}/faces/{face['id']}/consent", json={"consent_status": "approved"}
+    ).raise_for_status()
+    queue.pending.clear()
+    response = client.get(f"/photos/{photo['id']}/blurred_url")
+    assert response.status_code == 409
+    assert [(name, args) for name, args, _ in queue.pending] == [("worker.tasks.generate_blur", [photo["id"]])]
+
+    old_key = variant.s3_key
+    run_tasks()
+    db.expire_all()
+    assert variant.s3_key != old_key
+    assert old_key not in s3.objects
+    assert client.get(f"/photos/{photo['id']}/blurred_url").json()["url"].endswith(variant.s3_key)
+
+
+def test_outdated_build_is_not_recorded(client, upload, run_tasks, queue, db, s3, monkeypatch):
+    from worker import tasks
+
+    photo = photo_with_faces(client, upload, run_tasks)
+    row = db.get(models.Photo, photo["id"])
+    current_key = row.blurred_variant.s3_key
+    face = db.get(models.Face, photo["faces"][0]["id"])
+    rejected = models.ConsentStatus.REJECTED
+    blur = tasks.get_blur_engine().blur
+
+    def blur_then_change_consent(image, boxes, mode):
+        # Another request changes a consent while the variant is built.
+        face.consent_status = rejected if face.consent_status != rejected else models.ConsentStatus.APPROVED
+        db.commit()
+        return blur(image, boxes, mode)
+
+    monkeypatch.setattr(tasks.get_blur_engine(), "blur", blur_then_change_consent)
+    row.blurred_variant.is_stale = True
+    db.commit()
+    tasks.generate_blur.run(photo["id"])
+    db.expire_all()
+    assert row.blurred_variant.s3_key == current_key
+    assert blur_objects(s3, row.s3_key) == [current_key]
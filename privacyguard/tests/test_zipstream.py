@@ -0,0 +1,74 @@
+"""Streaming ZIP writer and the export archives built with it."""
+import io
+import os
+import zipfile
+
+from backend.app.zipstream import stream_zip
+
+
+def read_zip(chunks) -> zipfile.ZipFile:
+    return zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+
+def test_archive_round_trip():
+    payloads = {"a.jpg": os.urandom(100_000), "b.jpg": b"", "dir/c.txt": b"hello " * 1000}
+    entries = [(name, [data[i : i + 4096] for i in range(0, len(data), 4096)]) for name, data in payloads.items()]
+    archive = read_zip(stream_zip(entries))
+    assert archive.testzip() is None
+    assert archive.namelist() == list(payloads)
+    for name, data in payloads.items():
+        assert archive.read(name) == data
+        assert archive.getinfo(name).compress_type == zipfile.ZIP_STORED
+
+
+def test_deflated():
+    data = b"a" * 100_000
+    chunks = list(stream_zip([("a.txt", [data])], compression=zipfile.ZIP_DEFLATED))
+    assert sum(map(len, chunks)) < len(data) // 10
+    assert read_zip(chunks).read("a.txt") == data
+
+
+def test_empty_archive():
+    assert read_zip(stream_zip([])).namelist() == []
+
+
+def test_entries_are_consumed_lazily():
+    pulled = []
+
+    def entries():
+        for i in range(3):
+            pulled.append(i)
+            yield f"{i}.bin", [bytes(1000)]
+
+    stream = stream_zip(entries())
+    next(stream)
+    assert pulled == [0]
+    list(stream)
+    assert pulled == [0, 1, 2]
+
+
+def test_chunks_are_not_buffered_whole():
+    chunk = bytes(64 * 1024)
+    sizes = [len(piece) for piece in stream_zip([("big.bin", (chunk for _ in range(32)))])]
+    assert len(sizes) >= 32
+    assert max(sizes) <= len(chunk) + 1024
+
+
+def test_approved_export_contains_the_originals(client, upload, run_tasks, s3):
+    upload(4)
+    run_tasks()
+    photo = next(photo for photo in client.get("/photos").json() if photo["faces"])
+    for face in photo["faces"]:
+        client.post(
+            f"/photos/{photo['id']}/faces/{face['id']}/consent", json={"consent_status": "approved"}
+        ).raise_for_status()
+    response = client.get("/export/approved")
+    response.raise_for_status()
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    photos = {photo["filename"]: photo for photo in client.get("/photos").json()}
+    shareable = {name for name, photo in photos.items() if photo["consent_summary"] in ("no_faces", "approved")}
+    assert photo["filename"] in shareable
+    assert set(archive.namelist()) == shareable
+    for name in archive.namelist():
+        url = client.get(f"/photos/{photos[name]['id']}/url").json()["url"]
+        assert archive.read(name) == s3.objects[url.rsplit("/", 1)[1]]
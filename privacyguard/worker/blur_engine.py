@@ -0,0 +1,198 @@
+"""
+Multi-process blur engine for face redaction.
+
+Blurring large photos is CPU bound and Pillow filters hold a single core,
+so a worker that blurs a batch after a consent sweep is limited to one CPU.
+`BlurEngine` fans the work out to a process pool. Pixels are never pickled:
+each image is copied once into a `multiprocessing.shared_memory` segment
+and the pool processes receive only the segment name, the image shape and
+the boxes they are responsible for. They blur those regions in place and
+the parent reads the result back from the same segment.
+
+Boxes that overlap are always handled by the same task so that the result
+is identical to blurring them one after another in a single process. Any
+mode of `worker.redaction` can be used.
+
+The engine falls back to blurring in the calling process when it is
+configured with fewer than two workers, when the job makes a single task
+(one photo in a vectorized mode, or one photo whose faces all overlap),
+when the job is too small to amortise the IPC, or when the current
+process is daemonic (as Celery prefork children are) and therefore cannot
+start children of its own.
+The worker image runs Celery with `--pool threads` for that reason.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from worker.redaction import GAUSSIAN, PixelBox, redact_pixel_boxes, redact_pixels, to_pixel_box
+
+
+# A blur job: the image and the relative boxes (left, top, width, height) to blur.
+BlurJob = Tuple[Image.Image, Sequence[dict]]
+
+
+def _overlaps(a: PixelBox, b: PixelBox) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def group_overlapping(boxes: Sequence[PixelBox]) -> List[List[PixelBox]]:
+    """Partition boxes into groups such that no two groups overlap."""
+    parent = list(range(len(boxes)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(boxes)):
+        for j in range(i + 1, len(boxes)):
+            if _overlaps(boxes[i], boxes[j]):
+                parent[find(i)] = find(j)
+    groups = {}
+    for i, box in enumerate(boxes):
+        groups.setdefault(find(i), []).append(box)
+    return list(groups.values())
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment owned by the parent process."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: pool processes share the parent's resource tracker,
+        # so registering the segment again here is harmless.
+        return shared_memory.SharedMemory(name=name)
+
+
+def _blur_shared(name: str, shape: Tuple[int, int, int], boxes: Sequence[PixelBox], mode: str) -> None:
+    """Pool entry point: redact `boxes` of the image stored in segment `name`."""
+    shm = _attach(name)
+    try:
+        pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        redact_pixels(pixels, boxes, mode)
+        del pixels
+    finally:
+        shm.close()
+
+
+class BlurEngine:
+    """
+    Blur faces in one or many images using a pool of processes.
+
+    Args:
+        workers: Number of pool processes. Defaults to `BLUR_ENGINE_WORKERS`
+            or the CPU count. Values below 2 disable the pool.
+        min_pixels: Jobs whose boxes cover fewer pixels than this are blurred
+            in the calling process. Defaults to `BLUR_ENGINE_MIN_PIXELS`.
+    """
+
+    def __init__(self, workers: Optional[int] = None, min_pixels: Optional[int] = None) -> None:
+        if workers is None:
+            workers = int(os.getenv("BLUR_ENGINE_WORKERS", str(os.cpu_count() or 1)))
+        if min_pixels is None:
+            min_pixels = int(os.getenv("BLUR_ENGINE_MIN_PIXELS", str(256 * 1024)))
+        self.workers = workers
+        self.min_pixels = min_pixels
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers < 2 or multiprocessing.current_process().daemon:
+            return None
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(os.getenv("BLUR_ENGINE_START_METHOD", "spawn"))
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def shutdown(self) -> None:
+        """Stop the pool processes, if any were started."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def blur(self, image: Image.Image, boxes: Sequence[dict], mode: str = GAUSSIAN) -> Image.Image:
+        """Return a copy of `image` with the given relative boxes redacted."""
+        return self.blur_many([(image, boxes)], mode)[0]
+
+    def blur_many(self, jobs: Sequence[BlurJob], mode: str = GAUSSIAN) -> List[Image.Image]:
+        """
+        Redact several images at once, returning new images in the same order.
+
+        In ``gaussian`` mode every group of overlapping boxes of every image
+        becomes one pool task, so a single photo with many faces and a batch
+        of photos both spread across the available processes. The vectorized
+        modes of `worker.redaction` read pixels around each box and already
+        process all boxes of a photo in one pass, so they are fanned out one
+        task per image. Jobs that make up a single task are redacted in the
+        calling process.
+        """
+        prepared = []
+        total_pixels = 0
+        tasks = 0
+        for image, boxes in jobs:
+            w, h = image.size
+            pixel_boxes = [b for b in (to_pixel_box(bbox, w, h) for bbox in boxes) if b[2] > b[0] and b[3] > b[1]]
+            total_pixels += sum((r - l) * (b - t) for l, t, r, b in pixel_boxes)
+            if mode == GAUSSIAN:
+                groups = group_overlapping(pixel_boxes)
+            else:
+                groups = [pixel_boxes] if pixel_boxes else []
+            tasks += len(groups)
+            prepared.append((image, pixel_boxes, groups))
+
+        # A single task gains nothing from the pool and would still pay for
+        # two full-frame copies through shared memory.
+        executor = None
+        if tasks >= 2 and total_pixels >= self.min_pixels:
+            executor = self._get_executor()
+        if executor is None:
+            return [redact_pixel_boxes(image, pixel_boxes, mode) for image, pixel_boxes, _ in prepared]
+
+        segments = []
+        try:
+            futures = []
+            for image, _, groups in prepared:
+                w, h = image.size
+                shape = (h, w, 3)
+                shm = shared_memory.SharedMemory(create=True, size=h * w * 3)
+                segments.append((shm, shape))
+                np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)[:] = np.asarray(image.convert("RGB"))
+                for group in groups:
+                    futures.append(executor.submit(_blur_shared, shm.name, shape, group, mode))
+            for future in futures:
+                future.result()
+            results = []
+            for shm, shape in segments:
+                pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+                results.append(Image.fromarray(pixels.copy()))
+                del pixels
+            return results
+        finally:
+            for shm, _ in segments:
+                shm.close()
+                shm.unlink()
+
+
+_engine: Optional[BlurEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_blur_engine() -> BlurEngine:
+    """Return the process-wide blur engine, creating it on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = BlurEngine()
+            atexit.register(_engine.shutdown)
+        return _engine
@@ -0,0 +1,70 @@
+"""
+Downscaled proxy images for face detection.
+
+Rekognition returns bounding boxes relative to the image (0-1), so
+detection does not need the full-resolution original: a proxy whose long
+edge is `DETECTION_PROXY_LONG_EDGE` pixels yields the same boxes for every
+face that stays large enough to be found, while uploading a fraction of
+the bytes. It also keeps multi-megabyte originals under the 5 MB limit of
+inline image bytes, above which DetectFaces fails and the photo would end
+up with no faces at all.
+
+JPEGs are decoded with DCT scaling (`Image.draft`), which lets the decoder
+skip most of the work for large reductions. EXIF metadata is carried over
+so that the proxy is interpreted in the same orientation as the original.
+"""
+import io
+import os
+from typing import Optional
+
+from PIL import Image
+
+
+# Largest image accepted by Rekognition as inline `Image.Bytes`.
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+JPEG_QUALITY = 90
+
+
+def get_long_edge() -> int:
+    """Return `DETECTION_PROXY_LONG_EDGE` (default 1920; 0 disables downscaling, not the size cap)."""
+    return int(os.getenv("DETECTION_PROXY_LONG_EDGE", "1920"))
+
+
+def make_proxy(data: bytes, long_edge: Optional[int] = None, max_bytes: int = MAX_IMAGE_BYTES) -> bytes:
+    """
+    Return the image to send to face detection in place of `data`.
+
+    The original bytes are returned untouched when they already fit within
+    `long_edge` and `max_bytes`, or when the image cannot be decoded.
+    Otherwise the image is reduced to `long_edge` pixels on its long side,
+    and further halved until the JPEG encoding fits within `max_bytes`.
+
+    A `long_edge` of 0 disables only the downscaling: originals within
+    `max_bytes` are sent as they are, but larger ones are still re-encoded
+    at full size and then halved until they fit, since DetectFaces would
+    reject them.
+    """
+    if long_edge is None:
+        long_edge = get_long_edge()
+    try:
+        image = Image.open(io.BytesIO(data))
+        width, height = image.size
+        if long_edge <= 0 or max(width, height) <= long_edge:
+            if len(data) <= max_bytes:
+                return data
+            long_edge = max(width, height)
+        exif = image.info.get("exif")
+        target = (long_edge, long_edge)
+        # Decode directly at 1/2, 1/4 or 1/8 scale when the format allows it.
+        image.draft("RGB", target)
+        image = image.convert("RGB")
+        while True:
+            proxy = image.copy()
+            proxy.thumbnail(target, Image.Resampling.BILINEAR)
+            buffer = io.BytesIO()
+            proxy.save(buffer, format="JPEG", quality=JPEG_QUALITY, **({"exif": exif} if exif else {}))
+            if buffer.tell() <= max_bytes or target[0] <= 64:
+                return buffer.getvalue()
+            target = (target[0] // 2, target[1] // 2)
+    except Exception:
+        return data
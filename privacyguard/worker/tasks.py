@@ -9,15 +9,20 @@ to manipulate images for blurring.
 """
 import io
 import os
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
-import boto3
-from botocore.client import Config
 from celery import Celery
+from celery.signals import worker_process_init
 from PIL import Image, ImageFilter
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session, selectinload
 
-from backend.app import database, models
+from backend.app import consent, database, models, phash, renditions, variants
+from backend.app.aws import get_collection_id, get_rekognition_client, get_s3_client
+from backend.app.storage import delete_keys
+from worker import detection_proxy, redaction
+from worker.blur_engine import get_blur_engine
 
 
 # Create Celery instance. This must match the configuration used by the backend.
@@ -26,34 +31,16 @@ backend_url = os.getenv("CELERY_RESULT_BACKEND", "rpc://")
 celery = Celery("worker", broker=broker_url, backend=backend_url)
 
 
-def get_s3_client():
-    aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-    aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-    region = os.getenv("AWS_REGION", "us-east-1")
-    endpoint_url = os.getenv("AWS_ENDPOINT_URL")
-    use_ssl = os.getenv("AWS_USE_SSL", "False").lower() == "true"
-    return boto3.client(
-        "s3",
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key,
-        region_name=region,
-        endpoint_url=endpoint_url,
-        use_ssl=use_ssl,
-        config=Config(signature_version="s3v4"),
-    )
-
-
-def get_rekognition_client():
-    return boto3.client(
-        "rekognition",
-        region_name=os.getenv("AWS_REGION", "us-east-1"),
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    )
-
+@worker_process_init.connect
+def reset_db_pool(**kwargs) -> None:
+    """
+    Give each prefork child a connection pool of its own.
 
-def get_collection_id() -> str:
-    return os.getenv("AWS_REKOGNITION_COLLECTION", "privacyguard-collection")
+    Connections opened by the parent before forking must not be used by two
+    processes; `close=False` drops them from the child's pool without
+    closing the sockets the parent still owns.
+    """
+    database.engine.dispose(close=False)
 
 
 @celery.task(name="worker.tasks.process_photo")
@@ -64,58 +51,231 @@ def process_photo(photo_id: int) -> None:
     Steps:
         1. Set photo status to PROCESSING.
         2. Download image from S3/MinIO.
-        3. Call Rekognition DetectFaces.
-        4. Save bounding boxes to the faces table.
-        5. Update photo status to PROCESSED.
+        3. Compute the perceptual hash; if near-duplicate reuse is enabled
+           (`PHASH_MAX_DISTANCE`) and a processed near duplicate exists,
+           reuse its bounding boxes, otherwise call Rekognition DetectFaces
+           on a downscaled proxy of the image.
+        4. Store the thumbnail and preview renditions beside the original.
+        5. Save bounding boxes to the faces table.
+        6. Update photo status to PROCESSED.
     """
-    db: Session = next(database.get_db())
+    with database.session_scope() as db:
+        _process_photo(db, photo_id)
+
+
+def _process_photo(db: Session, photo_id: int) -> None:
     photo = db.query(models.Photo).filter(models.Photo.id == photo_id).first()
     if not photo:
         return
     photo.status = models.PhotoStatus.PROCESSING
     db.commit()
-    bucket = os.getenv("S3_BUCKET", "photos")
-    s3 = get_s3_client()
-    try:
-        obj = s3.get_object(Bucket=bucket, Key=photo.s3_key)
-        data = obj["Body"].read()
-    except Exception as e:
+    data = download(photo.s3_key)
+    if data is None:
         # Mark as processed even if image cannot be retrieved
         photo.status = models.PhotoStatus.PROCESSED
         db.commit()
         return
+    # Burst shots: reuse the boxes of a near-identical processed photo
+    # instead of paying for another detection.
+    boxes = None
+    hash_value = perceptual_hash(data)
+    if hash_value is not None:
+        phash.assign(photo, hash_value)
+        sibling = phash.find_near_duplicate(db, hash_value, exclude_id=photo.id)
+        if sibling is not None:
+            photo.near_duplicate_of = sibling.id
+            boxes = [dict(face.bbox) for face in sibling.faces]
+    if boxes is None:
+        boxes = detect_boxes(data)
+    photo.has_renditions = store_renditions(photo.s3_key, data)
+    # Remove existing face records (idempotence)
+    for f in photo.faces:
+        db.delete(f)
+    db.commit()
+    # Save new faces
+    for bbox in boxes:
+        db.add(new_face(photo.id, bbox))
+    consent.set_counts(photo, [models.ConsentStatus.PENDING] * len(boxes))
+    photo.status = models.PhotoStatus.PROCESSED
+    # New faces start as pending, so a blurred variant is needed right away.
+    variants.mark_stale(db, photo.id)
+    db.commit()
+    if boxes:
+        generate_blur.delay(photo.id)
+
+
+def download(key: str) -> Optional[bytes]:
+    """Return the content of an object of the photo bucket, or None if it cannot be read."""
+    try:
+        obj = get_s3_client().get_object(Bucket=os.getenv("S3_BUCKET", "photos"), Key=key)
+        return obj["Body"].read()
+    except Exception:
+        return None
+
+
+def perceptual_hash(data: bytes) -> Optional[int]:
+    """Return the dHash of an encoded image, or None if it cannot be decoded."""
+    try:
+        return phash.dhash(Image.open(io.BytesIO(data)))
+    except Exception:
+        return None
+
+
+def detect_boxes(data: bytes) -> List[dict]:
+    """
+    Run Rekognition DetectFaces on an encoded image and return relative bounding boxes.
+
+    Detection runs on a downscaled proxy of the image (see
+    `worker.detection_proxy`); the boxes are relative, so they apply to the
+    original as they are.
+    """
     rekog = get_rekognition_client()
     try:
         response = rekog.detect_faces(
-            Image={"Bytes": data},
+            Image={"Bytes": detection_proxy.make_proxy(data)},
             Attributes=["DEFAULT"],
         )
         face_details = response.get("FaceDetails", [])
     except Exception as e:
         face_details = []
-    # Remove existing face records (idempotence)
-    for f in photo.faces:
-        db.delete(f)
+    # Rekognition returns relative values (0-1)
+    return [
+        {
+            "left": fd.get("BoundingBox", {}).get("Left"),
+            "top": fd.get("BoundingBox", {}).get("Top"),
+            "width": fd.get("BoundingBox", {}).get("Width"),
+            "height": fd.get("BoundingBox", {}).get("Height"),
+        }
+        for fd in face_details
+    ]
+
+
+def store_renditions(key: str, data: bytes) -> bool:
+    """Render the thumbnail and preview of an original and store them beside it; return success."""
+    bucket = os.getenv("S3_BUCKET", "photos")
+    s3 = get_s3_client()
+    try:
+        for name, rendition in renditions.render(data).items():
+            s3.put_object(
+                Bucket=bucket, Key=renditions.rendition_key(key, name), Body=rendition, ContentType="image/jpeg"
+            )
+    except Exception:
+        return False
+    return True
+
+
+def new_face(photo_id: int, bbox: dict) -> models.Face:
+    """Return a freshly detected face, pending consent."""
+    return models.Face(
+        photo_id=photo_id,
+        rekognition_face_id=None,
+        bbox=bbox,
+        name=None,
+        consent_status=models.ConsentStatus.PENDING,
+    )
+
+
+def get_batch_concurrency() -> int:
+    """Return `PROCESS_BATCH_CONCURRENCY`, the photos of a batch downloaded and detected at once."""
+    return max(1, int(os.getenv("PROCESS_BATCH_CONCURRENCY", "8")))
+
+
+@celery.task(name="worker.tasks.process_photos_batch")
+def process_photos_batch(photo_ids: List[int]) -> None:
+    """
+    Celery task that performs face detection on several photos at once.
+
+    Produces the same result as `process_photo` for each photo, but instead
+    of handling them one after the other it overlaps the slow parts:
+
+        1. Set every photo to PROCESSING in one UPDATE.
+        2. Download and hash the originals, `PROCESS_BATCH_CONCURRENCY` at
+           a time.
+        3. Resolve near duplicates, both against processed photos and
+           within the batch, so a burst is detected only once.
+        4. Call DetectFaces for the remaining photos concurrently, while
+           the renditions of every photo are rendered and stored.
+        5. Replace the faces, counters and variant state of the whole batch
+           and commit once.
+    """
+    with database.session_scope() as db:
+        _process_photos_batch(db, photo_ids)
+
+
+def _process_photos_batch(db: Session, photo_ids: List[int]) -> None:
+    if not photo_ids:
+        return
+    db.execute(
+        update(models.Photo).where(models.Photo.id.in_(photo_ids)).values(status=models.PhotoStatus.PROCESSING)
+    )
     db.commit()
-    # Save new faces
-    for fd in face_details:
-        bbox = fd.get("BoundingBox", {})
-        # Rekognition returns relative values (0-1)
-        face_record = models.Face(
-            photo_id=photo.id,
-            rekognition_face_id=None,
-            bbox={
-                "left": bbox.get("Left"),
-                "top": bbox.get("Top"),
-                "width": bbox.get("Width"),
-                "height": bbox.get("Height"),
-            },
-            name=None,
-            consent_status=models.ConsentStatus.PENDING,
+    photos = (
+        db.query(models.Photo)
+        .options(selectinload(models.Photo.blurred_variant))
+        .filter(models.Photo.id.in_(photo_ids))
+        .order_by(models.Photo.id)
+        .all()
+    )
+    if not photos:
+        return
+    # Worker threads only see plain values, never the session or its objects.
+    ids = [photo.id for photo in photos]
+    keys = [photo.s3_key for photo in photos]
+    with ThreadPoolExecutor(max_workers=get_batch_concurrency(), thread_name_prefix="process") as executor:
+        contents = list(executor.map(download, keys))
+        hashes = list(executor.map(lambda data: perceptual_hash(data) if data is not None else None, contents))
+
+        boxes: List[Optional[List[dict]]] = [None] * len(photos)
+        leaders = {}  # index of a batch photo -> index of the batch photo it duplicates
+        max_distance = phash.get_max_distance()
+        for i, (photo, hash_value) in enumerate(zip(photos, hashes)):
+            if hash_value is None:
+                continue
+            phash.assign(photo, hash_value)
+            sibling = phash.find_near_duplicate(db, hash_value, exclude_id=ids[i], max_distance=max_distance)
+            if sibling is not None:
+                photo.near_duplicate_of = sibling.id
+                boxes[i] = [dict(face.bbox) for face in sibling.faces]
+                continue
+            # Burst shots uploaded together are not processed yet: look for
+            # an earlier photo of this batch instead.
+            for j in range(i):
+                if hashes[j] is not None and phash.hamming(hash_value, hashes[j]) <= max_distance:
+                    photo.near_duplicate_of = ids[j]
+                    leaders[i] = leaders.get(j, j)
+                    break
+
+        downloaded = [i for i in range(len(photos)) if contents[i] is not None]
+        rendered = executor.map(store_renditions, [keys[i] for i in downloaded], [contents[i] for i in downloaded])
+        to_detect = [i for i in downloaded if boxes[i] is None and i not in leaders]
+        for i, detected in zip(to_detect, executor.map(detect_boxes, [contents[i] for i in to_detect])):
+            boxes[i] = detected
+        for i, stored in zip(downloaded, rendered):
+            photos[i].has_renditions = stored
+    for i, j in leaders.items():
+        boxes[i] = [dict(bbox) for bbox in boxes[j]]
+    del contents
+
+    # Remove existing face records (idempotence), in one statement.
+    processed = [photo_id for photo_id, photo_boxes in zip(ids, boxes) if photo_boxes is not None]
+    if processed:
+        db.execute(
+            delete(models.Face).where(models.Face.photo_id.in_(processed)),
+            execution_options={"synchronize_session": False},
         )
-        db.add(face_record)
-    photo.status = models.PhotoStatus.PROCESSED
+    for photo_id, photo, photo_boxes in zip(ids, photos, boxes):
+        photo.status = models.PhotoStatus.PROCESSED
+        if photo_boxes is None:
+            # Mark as processed even if image cannot be retrieved
+            continue
+        db.add_all([new_face(photo_id, bbox) for bbox in photo_boxes])
+        consent.set_counts(photo, [models.ConsentStatus.PENDING] * len(photo_boxes))
+        # New faces start as pending, so a blurred variant is needed right away.
+        variants.mark_photo_stale(photo)
     db.commit()
+    for photo_id, photo_boxes in zip(ids, boxes):
+        if photo_boxes:
+            generate_blur.delay(photo_id)
 
 
 @celery.task(name="worker.tasks.index_face")
@@ -126,7 +286,11 @@ def index_face(face_id: int) -> None:
     The face is cropped out of the original image using its bounding box and
     uploaded to Rekognition. The returned FaceId is stored in the database.
     """
-    db: Session = next(database.get_db())
+    with database.session_scope() as db:
+        _index_face(db, face_id)
+
+
+def _index_face(db: Session, face_id: int) -> None:
     face = db.query(models.Face).filter(models.Face.id == face_id).first()
     if not face or not face.name:
         return
@@ -180,26 +344,32 @@ def index_face(face_id: int) -> None:
         pass
 
 
-def blur_faces_in_image(image: Image.Image, boxes: List[dict]) -> Image.Image:
+def blur_faces_in_image(image: Image.Image, boxes: List[dict], mode: str = redaction.GAUSSIAN) -> Image.Image:
     """
     Apply a Gaussian blur to all regions defined by relative bounding boxes.
 
+    This is the single-threaded reference implementation; tasks use
+    `worker.blur_engine.get_blur_engine()`, which produces the same output
+    using a process pool. Boxes are clipped to the image as in the engine
+    (see `redaction.to_pixel_box`).
+
     Args:
         image: Pillow Image to modify.
         boxes: List of dicts with keys left, top, width, height (relative 0-1).
+        mode: Redaction mode. Anything other than ``gaussian`` is delegated
+            to the vectorized backends in `worker.redaction`.
 
     Returns:
         A new Image with blurred regions.
     """
+    if mode != redaction.GAUSSIAN:
+        return redaction.redact_image(image, boxes, mode)
     w, h = image.size
     result = image.copy()
     for bbox in boxes:
-        left = int(bbox["left"] * w)
-        top = int(bbox["top"] * h)
-        width = int(bbox["width"] * w)
-        height = int(bbox["height"] * h)
-        right = min(left + width, w)
-        bottom = min(top + height, h)
+        left, top, right, bottom = redaction.to_pixel_box(bbox, w, h)
+        if right <= left or bottom <= top:
+            continue
         region = result.crop((left, top, right, bottom))
         blurred_region = region.filter(ImageFilter.GaussianBlur(radius=15))
         result.paste(blurred_region, (left, top))
@@ -207,18 +377,36 @@ def blur_faces_in_image(image: Image.Image, boxes: List[dict]) -> Image.Image:
 
 
 @celery.task(name="worker.tasks.generate_blur")
-def generate_blur(photo_id: int) -> None:
+def generate_blur(photo_id: int, mode: Optional[str] = None) -> None:
     """
     Generate a blurred version of a photo for faces without consent.
 
     Creates a copy of the original image where all faces with consent_status
-    not APPROVED are blurred. The blurred image is saved back to S3 with
-    the suffix `_blur`.
+    not APPROVED are blurred. The blurred image is saved back to S3 under
+    a key derived from the consent fingerprint it was built from (see
+    `variants.blur_key`) and recorded as the photo's blurred variant; the
+    object of the variant it replaces is deleted.
+
+    `mode` selects the redaction backend (see `worker.redaction`). It is
+    remembered for the photo, so that later rebuilds (e.g. after a consent
+    change) keep it; photos without a mode of their own follow
+    `REDACTION_MODE`.
     """
-    db: Session = next(database.get_db())
+    with database.session_scope() as db:
+        _generate_blur(db, photo_id, mode)
+
+
+def _generate_blur(db: Session, photo_id: int, mode: Optional[str] = None) -> None:
     photo = db.query(models.Photo).filter(models.Photo.id == photo_id).first()
     if not photo:
         return
+    if mode:
+        variants.get_or_create_variant(db, photo.id).mode = mode
+        db.commit()
+    mode = variants.get_variant_mode(photo.blurred_variant)
+    # Skip the work if a concurrent task already built this exact variant.
+    if variants.is_current(photo.blurred_variant, photo.faces, mode):
+        return
     bucket = os.getenv("S3_BUCKET", "photos")
     s3 = get_s3_client()
     try:
@@ -228,17 +416,32 @@ def generate_blur(photo_id: int) -> None:
         return
     image = Image.open(io.BytesIO(original_data)).convert("RGB")
     # Collect bounding boxes of faces that need blurring
-    boxes_to_blur = [face.bbox for face in photo.faces if face.consent_status != models.ConsentStatus.APPROVED]
+    fingerprint = variants.consent_fingerprint(photo.faces, mode)
+    boxes_to_blur = variants.boxes_to_blur(photo.faces)
     if not boxes_to_blur:
         # Nothing to blur; copy original
         blurred_image = image
     else:
-        blurred_image = blur_faces_in_image(image, boxes_to_blur)
+        blurred_image = get_blur_engine().blur(image, boxes_to_blur, mode)
     buffer = io.BytesIO()
     blurred_image.save(buffer, format="JPEG")
     blurred_bytes = buffer.getvalue()
-    # Save blurred image with new key
-    key = f"{photo.s3_key.rsplit('.', 1)[0]}_blur.jpg"
+    # Save blurred image under a key of its own, never over the current one
+    key = variants.blur_key(photo.s3_key, fingerprint)
     s3.put_object(Bucket=bucket, Key=key, Body=blurred_bytes, ContentType="image/jpeg")
-    # Optionally store blurred key in DB or elsewhere
-    return
\ No newline at end of file
+    # Consent may have changed while blurring; re-read the faces so a variant
+    # built from outdated consents is never recorded. The change that made
+    # it outdated marked the variant stale and queued a fresh build.
+    db.expire_all()
+    if fingerprint != variants.consent_fingerprint(photo.faces, mode):
+        delete_keys(s3, bucket, [key])
+        return
+    variant = variants.get_or_create_variant(db, photo.id)
+    previous_key = variant.s3_key
+    variant.s3_key = key
+    variant.consent_fingerprint = fingerprint
+    variant.is_stale = False
+    db.commit()
+    # Only drop the previous object once no committed row points at it.
+    if previous_key and previous_key != key:
+        delete_keys(s3, bucket, [previous_key])